@@ -1,13 +1,16 @@
+import json
+import os
+
 import numpy as np
-from PIL import Image
-from mss import mss
-from onnxruntime import InferenceSession, SessionOptions, GraphOptimizationLevel, ExecutionMode, get_available_providers
-from pyautogui import size as pyautogui_size
-from dbd.utils.frame_grabber import get_monitor_attributes
-
-def get_monitor_attributes():
-    # Calculate capture region based on current screen size.
-    width, height = pyautogui_size()
+import onnxruntime
+from onnxruntime import InferenceSession, SessionOptions, GraphOptimizationLevel, ExecutionMode, OrtValue, get_available_providers
+from dbd.capture import MSSCapture, create_capture
+
+def get_monitor_attributes(width=None, height=None):
+    # Calculate capture region based on the screen size (queried when not given).
+    if width is None or height is None:
+        from pyautogui import size as pyautogui_size  # imported lazily: needs a display
+        width, height = pyautogui_size()
     # We want a square region roughly scaled to 224 (the model’s expected input).
     # Adjust the scaling as needed; here we assume a 1920x1080 baseline.
     scale = min(width / 1920, height / 1080)
@@ -20,9 +23,139 @@ def get_monitor_attributes():
     }
     return monitor
 
+def resolve_regions(regions):
+    # capture_regions entries ({"left", "top", "width", "height"}) are desktop coordinates,
+    # or offsets within monitor N (numbered from 1, as by mss) when "monitor" is given.
+    monitors = None
+    resolved = []
+    for region in regions:
+        region = dict(region)
+        index = region.pop("monitor", None)
+        if index is not None:
+            if monitors is None:
+                import mss
+                with mss.mss() as sct:
+                    monitors = sct.monitors
+            screen = monitors[index]
+            region["left"] = region.get("left", 0) + screen["left"]
+            region["top"] = region.get("top", 0) + screen["top"]
+        resolved.append({key: int(region[key]) for key in ("top", "left", "width", "height")})
+    return resolved
+
+# Region for offline tools that never grab the screen, so AI_model does not query the display.
+OFFLINE_REGION = {"top": 0, "left": 0, "width": 224, "height": 224}
+
+# Faster variants to try per execution provider when no validated timings are available.
+VARIANT_PREFERENCE = {
+    "CPUExecutionProvider": ("int8", "fp32"),
+    "CUDAExecutionProvider": ("fp16", "fp32"),
+    "DmlExecutionProvider": ("fp16", "fp32"),
+}
+
+def variant_path(onnx_filepath, variant):
+    # model.onnx -> model.int8.onnx / model.fp16.onnx
+    root, ext = os.path.splitext(onnx_filepath)
+    return f"{root}.{variant}{ext}"
+
+def variant_manifest_path(onnx_filepath):
+    return os.path.splitext(onnx_filepath)[0] + ".variants.json"
+
+def variant_agrees(info, tolerance):
+    # Overall and per-class agreement with FP32 all within tolerance (manifest entry).
+    per_class = info.get("per_class")
+    if not per_class or info.get("agreement", 0.0) < 1.0 - tolerance:
+        return False
+    return all(result.get("agreement", 0.0) >= 1.0 - tolerance for result in per_class.values())
+
+def select_variant(onnx_filepath, provider, variant="auto", tolerance=0.01):
+    """Pick the model file to load for `provider`.
+
+    `variant` names a variant explicitly ("int8", "fp16") or is "auto" for the fastest one
+    whose agreement with FP32 (from the manifest written by `model_tools validate`) is within
+    `tolerance`, overall and for every class in the validation frames: recorded frames are
+    mostly "None", so the rare hit classes would otherwise barely move the overall figure.
+    Falls back to the FP32 model when nothing qualifies.
+    """
+    if variant == "fp32":
+        return onnx_filepath
+    if variant != "auto":
+        path = variant_path(onnx_filepath, variant)
+        return path if os.path.exists(path) else onnx_filepath
+
+    manifest_file = variant_manifest_path(onnx_filepath)
+    if not os.path.exists(manifest_file):
+        return onnx_filepath
+    with open(manifest_file, "r") as f:
+        manifest = json.load(f)
+
+    candidates = {"fp32": (onnx_filepath, manifest.get("fp32_latency_ms", {}).get(provider))}
+    for name, info in manifest.get("variants", {}).items():
+        path = os.path.join(os.path.dirname(onnx_filepath), info.get("file", ""))
+        if variant_agrees(info, tolerance) and os.path.isfile(path):
+            candidates[name] = (path, info.get("latency_ms", {}).get(provider))
+
+    timed = [candidate for candidate in candidates.values() if candidate[1] is not None]
+    if timed:
+        return min(timed, key=lambda candidate: candidate[1])[0]
+    for name in VARIANT_PREFERENCE.get(provider, ("fp32",)):
+        if name in candidates:
+            return candidates[name][0]
+    return onnx_filepath
+
+def apply_session_config(sess_options, session_config):
+    """Apply a tuned session configuration (see dbd.autotune) and return the provider list.
+
+    Keys: provider, execution_mode ("sequential"/"parallel"), intra_op_threads,
+    inter_op_threads and allow_spinning; missing keys keep ORT defaults.
+    """
+    provider = session_config.get("provider", "CPUExecutionProvider")
+    sequential = session_config.get("execution_mode") == "sequential" or provider == "DmlExecutionProvider"
+    sess_options.execution_mode = ExecutionMode.ORT_SEQUENTIAL if sequential else ExecutionMode.ORT_PARALLEL
+    if provider == "DmlExecutionProvider":
+        # DirectML supports neither memory patterns nor parallel execution.
+        sess_options.enable_mem_pattern = False
+    if session_config.get("intra_op_threads"):
+        sess_options.intra_op_num_threads = session_config["intra_op_threads"]
+    if session_config.get("inter_op_threads"):
+        sess_options.inter_op_num_threads = session_config["inter_op_threads"]
+    if "allow_spinning" in session_config:
+        spinning = "1" if session_config["allow_spinning"] else "0"
+        sess_options.add_session_config_entry("session.intra_op.allow_spinning", spinning)
+        sess_options.add_session_config_entry("session.inter_op.allow_spinning", spinning)
+    if provider == "CPUExecutionProvider":
+        return [provider]
+    return [provider, "CPUExecutionProvider"]
+
+# Providers whose optimized graphs can be serialized and reloaded (compiling EPs such as DML cannot).
+OPTIMIZED_CACHE_PROVIDERS = ("CPUExecutionProvider", "CUDAExecutionProvider")
+
+def optimized_model_path(onnx_filepath, provider, cache_dir):
+    # Cache file for ORT's optimized graph, keyed by model file, provider and hardware: at
+    # ORT_ENABLE_ALL the saved graph holds CPU-specific fused kernels and layouts, so a cache
+    # copied to (or left on) another machine must not be reused. The fingerprint covers the
+    # ORT version. Imported here since dbd.autotune imports this module.
+    from dbd.autotune import hardware_fingerprint
+    stat = os.stat(onnx_filepath)
+    name = os.path.splitext(os.path.basename(onnx_filepath))[0]
+    tag = f"{stat.st_size}-{int(stat.st_mtime)}-{provider.replace('ExecutionProvider', '')}-{hardware_fingerprint()}"
+    return os.path.join(cache_dir, f"{name}.{tag}.opt.onnx")
+
+def preload_cuda_libraries():
+    # CUDA/cuDNN must be loadable before a CUDA session is created. Recent onnxruntime builds
+    # load them from the nvidia-* wheels directly, which is much cheaper than importing torch.
+    import importlib.util
+    if hasattr(onnxruntime, "preload_dlls") and importlib.util.find_spec("nvidia") is not None:
+        onnxruntime.preload_dlls()
+    else:
+        import torch  # Needed to load cuDNN even if torch isn’t used directly
+
 class AI_model:
+    INPUT_SIZE = 224
     MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
     STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+    # (x / 255 - MEAN) / STD folded into a single per-channel multiply and subtract.
+    NORM_SCALE = (1.0 / (255.0 * STD)).reshape(3, 1, 1)
+    NORM_SHIFT = (MEAN / STD).reshape(3, 1, 1)
 
     # This dictionary maps predictions to descriptions and whether a hit should be triggered.
     pred_dict = {
@@ -38,44 +171,195 @@ class AI_model:
         9: {"desc": "wiggle (frontier)", "hit": False},
         10: {"desc": "wiggle (out)", "hit": False}
     }
+    # Per-class lookups derived from pred_dict so the per-frame decision is a plain index.
+    DESCRIPTIONS = tuple(entry["desc"] for _, entry in sorted(pred_dict.items()))
+    HIT_MASK = np.array([entry["hit"] for _, entry in sorted(pred_dict.items())], dtype=bool)
 
-    def __init__(self, onnx_filepath="model.onnx", use_gpu=False, nb_cpu_threads=None):
+    def __init__(self, onnx_filepath="model.onnx", use_gpu=False, nb_cpu_threads=None, use_io_binding=True, monitor=None,
+                 variant="fp32", variant_tolerance=0.01, session_config=None, optimized_cache_dir=None, capture=None,
+                 cascade_model=None, cascade_threshold=0.2, cascade_refresh=15, regions=None):
         # Create and configure session options.
         sess_options = SessionOptions()
         sess_options.graph_optimization_level = GraphOptimizationLevel.ORT_ENABLE_ALL
         # Use parallel execution mode for performance improvements if supported.
         sess_options.execution_mode = ExecutionMode.ORT_PARALLEL
 
-        if use_gpu:
+        if session_config is not None:
+            # A tuned configuration (dbd.autotune) replaces use_gpu/nb_cpu_threads.
+            execution_providers = apply_session_config(sess_options, session_config)
+        elif use_gpu:
             available_providers = get_available_providers()
             preferred_execution_providers = ['CUDAExecutionProvider', 'DmlExecutionProvider', 'CPUExecutionProvider']
             # Pick the first available provider from our list.
             execution_providers = [p for p in preferred_execution_providers if p in available_providers]
-            if execution_providers and execution_providers[0] == "CUDAExecutionProvider":
-                import torch  # Needed to load cuDNN even if torch isn’t used directly
         else:
             execution_providers = ['CPUExecutionProvider']
             if nb_cpu_threads is not None:
                 # Set the number of CPU threads to use.
                 sess_options.intra_op_num_threads = nb_cpu_threads
                 sess_options.inter_op_num_threads = nb_cpu_threads
+        if execution_providers and execution_providers[0] == "CUDAExecutionProvider":
+            preload_cuda_libraries()
+
+        # Swap in an INT8/FP16 variant when one is validated for the provider we are about to use.
+        onnx_filepath = select_variant(onnx_filepath, execution_providers[0], variant, variant_tolerance)
+        self.model_path = onnx_filepath
+
+        session_path = onnx_filepath
+        if optimized_cache_dir and execution_providers[0] in OPTIMIZED_CACHE_PROVIDERS:
+            cached = optimized_model_path(onnx_filepath, execution_providers[0], optimized_cache_dir)
+            if os.path.exists(cached):
+                # Already optimized on an earlier start: skip the graph rewrite on load.
+                session_path = cached
+                sess_options.graph_optimization_level = GraphOptimizationLevel.ORT_DISABLE_ALL
+            else:
+                os.makedirs(optimized_cache_dir, exist_ok=True)
+                sess_options.optimized_model_filepath = cached
 
-        self.ort_session = InferenceSession(onnx_filepath, providers=execution_providers, sess_options=sess_options)
+        try:
+            self.ort_session = InferenceSession(session_path, providers=execution_providers, sess_options=sess_options)
+        except Exception:
+            if session_path == onnx_filepath:
+                raise
+            # A stale or truncated cache entry; drop it and optimize from the original model.
+            os.remove(session_path)
+            sess_options.graph_optimization_level = GraphOptimizationLevel.ORT_ENABLE_ALL
+            sess_options.optimized_model_filepath = session_path
+            self.ort_session = InferenceSession(onnx_filepath, providers=execution_providers, sess_options=sess_options)
         self.input_name = self.ort_session.get_inputs()[0].name
+        self.output_name = self.ort_session.get_outputs()[0].name
+
+        # Several capture regions are stacked into one (N, 3, 224, 224) input and run as a
+        # single batch; models exported with a fixed batch size run once per region instead.
+        self.regions = list(regions) if regions else None
+        self.batch_size = len(self.regions) if self.regions else 1
+        batch_dim = self.ort_session.get_inputs()[0].shape[0]
+        self.batched = self.batch_size == 1 or not isinstance(batch_dim, int) or batch_dim == self.batch_size
+        if not self.batched:
+            use_io_binding = False
+
+        # Optional tiny pre-filter that lets predict() skip the full model on empty frames
+        # (single region only).
+        self.cascade = None
+        if cascade_model and self.batch_size == 1:
+            self.cascade = CascadeGate(cascade_model, execution_providers, cascade_threshold, cascade_refresh,
+                                       nb_threads=sess_options.intra_op_num_threads or None)
+        self._none_prediction = None
+
+        # Preallocated model input and resample scratch, reused for every frame by preprocess().
+        self.input_buffer = np.empty((self.batch_size, 3, self.INPUT_SIZE, self.INPUT_SIZE), dtype=np.float32)
+        self._pixels = np.empty((self.INPUT_SIZE, self.INPUT_SIZE, 4), dtype=np.uint8)
+        self._resize_index = {}  # gather index per capture size
+
+        self.io_binding = None
+        if use_io_binding:
+            try:
+                self._init_io_binding()
+            except Exception:
+                # Providers without IOBinding support fall back to plain run().
+                self.io_binding = None
 
-        # Create an instance of mss for screenshot capture.
-        self.mss = mss()
-        self.monitor = get_monitor_attributes()
+        self.capture = None
+        self.captures = []
+        self.set_capture(capture, monitor)
+
+    def set_capture(self, capture, monitor=None):
+        # Frame source: a CaptureBackend or a create_capture() name; mss by default.
+        # With several regions the name is needed, to open one backend per region.
+        if self.batch_size > 1 and not (capture is None or isinstance(capture, str)):
+            raise ValueError("Several capture regions need a capture backend name, not an instance")
+        name = capture or "mss"
+        if capture is None or isinstance(capture, str):
+            capture = create_capture(name)
+        for previous in self.captures:
+            if previous is not capture:
+                previous.close()
+        self.capture = capture
+        # Offline tools pass an explicit region (or use a file/synthetic source) so no display is needed.
+        if self.regions:
+            monitor = self.regions[0]
+        elif monitor is None:
+            monitor = capture.default_region() or get_monitor_attributes()
+        self.monitor = monitor
+        self.capture.setup(monitor)
+        self.captures = [capture]
+        for region in (self.regions or [])[1:]:
+            extra = create_capture(name)
+            extra.setup(region)
+            self.captures.append(extra)
+        self.frame_buffer = self.capture.allocate()
+        self._screenshots = capture if isinstance(capture, MSSCapture) else None
+
+    def close_capture(self):
+        # Release the display handles of every region's backend (reopened on the next grab).
+        for capture in self.captures:
+            capture.close()
+
+    def _init_io_binding(self):
+        # Bind persistent host buffers once so every frame reuses them. With CUDA/DML, ORT
+        # copies from/to these buffers into the device memory it keeps bound for the session.
+        output_shape = [d if isinstance(d, int) else 1 for d in self.ort_session.get_outputs()[0].shape]
+        output_shape[0] = self.batch_size
+        self.output_buffer = np.empty(output_shape, dtype=np.float32)
+        self.io_binding = self.ort_session.io_binding()
+        self._bound_inputs = {}
+        self._bound_ptr = None
+        self._bind_input(self.input_buffer)
+        self.io_binding.bind_ortvalue_output(self.output_name, OrtValue.ortvalue_from_numpy(self.output_buffer))
+
+    def _bind_input(self, image):
+        # Frame buffers are long-lived (input_buffer, FrameRing slots), so each one is wrapped in
+        # an OrtValue once and switching between them is only a rebind.
+        ptr = image.ctypes.data
+        if ptr == self._bound_ptr:
+            return
+        ortvalue = self._bound_inputs.get(ptr)
+        if ortvalue is None:
+            if len(self._bound_inputs) >= 8:
+                self._bound_inputs.clear()
+            ortvalue = self._bound_inputs[ptr] = OrtValue.ortvalue_from_numpy(image)
+        self.io_binding.bind_ortvalue_input(self.input_name, ortvalue)
+        self._bound_ptr = ptr
+
+    def warmup(self, runs=3):
+        # The first runs allocate memory arenas and select kernels (cuDNN autotuning on CUDA);
+        # do them before real frames arrive.
+        self.input_buffer.fill(0.0)
+        image = self.input_buffer if self.batched else self.input_buffer[:1]
+        for _ in range(runs):
+            self.infer(image)
+            if self.cascade is not None:
+                self.cascade.score(self.input_buffer)
 
     def check_provider(self):
         active_providers = self.ort_session.get_providers()
         return active_providers[0]
 
+    def grab(self, out=None):
+        # Grab the capture region into `out` (default: frame_buffer); returns (frame, perf_counter timestamp).
+        out = self.frame_buffer if out is None else out
+        return out, self.capture.grab_into(out)
+
+    def allocate_regions(self):
+        # One raw frame buffer per capture region.
+        return [capture.allocate() for capture in self.captures]
+
+    def grab_regions(self, frames):
+        # Grab every capture region into `frames`; returns (frames, timestamp of the first grab).
+        captured_at = self.capture.grab_into(frames[0])
+        for capture, frame in zip(self.captures[1:], frames[1:]):
+            capture.grab_into(frame)
+        return frames, captured_at
+
     def grab_screenshot(self):
-        # Capture the defined region of the screen.
-        return self.mss.grab(self.monitor)
+        # mss ScreenShot of the capture region, for the PIL path; the live loop uses grab().
+        if self._screenshots is None:
+            self._screenshots = MSSCapture()
+            self._screenshots.setup(self.monitor)
+        return self._screenshots.screenshot()
 
     def screenshot_to_pil(self, screenshot):
+        from PIL import Image  # only the PIL path needs Pillow; the live loop uses preprocess()
         # Convert the raw screenshot (BGRA) to an RGB PIL Image.
         pil_image = Image.frombytes("RGB", screenshot.size, screenshot.bgra, "raw", "BGRX")
         # Ensure the image is exactly 224x224 (resize if necessary)
@@ -90,19 +374,218 @@ class AI_model:
         img = np.transpose(img, (2, 0, 1))[None, ...]
         return img
 
+    def bgra_view(self, screenshot):
+        # Read-only (H, W, 4) view over the raw mss buffer, no copy.
+        return np.frombuffer(screenshot.bgra, dtype=np.uint8).reshape(screenshot.height, screenshot.width, 4)
+
+    def resample(self, frame):
+        # Nearest-neighbour resample of a BGRA frame to the model resolution.
+        # Frames already at 224x224 (1080p capture region) are passed through untouched.
+        height, width = frame.shape[:2]
+        if (height, width) == (self.INPUT_SIZE, self.INPUT_SIZE):
+            return frame
+        index = self._resize_index.get((height, width))
+        if index is None:
+            # Sample at pixel centres; the gather index only changes with the capture size.
+            rows = ((np.arange(self.INPUT_SIZE) + 0.5) * height / self.INPUT_SIZE).astype(np.intp)
+            cols = ((np.arange(self.INPUT_SIZE) + 0.5) * width / self.INPUT_SIZE).astype(np.intp)
+            index = self._resize_index[(height, width)] = rows[:, None] * width + cols[None, :]
+        np.take(frame.reshape(-1, 4), index, axis=0, out=self._pixels, mode="clip")
+        return self._pixels
+
+    def normalize(self, pixels, out=None):
+        # BGRA uint8 (H, W, 4) -> normalized RGB NCHW float32, written straight into `out`.
+        if out is None:
+            out = self.input_buffer
+        rgb = pixels[..., 2::-1].transpose(2, 0, 1)
+        np.multiply(rgb, self.NORM_SCALE, out=out[0])
+        np.subtract(out[0], self.NORM_SHIFT, out=out[0])
+        return out
+
+    def preprocess(self, screenshot, out=None):
+        # Fused capture-to-tensor path (same normalization as pil_to_numpy, no per-frame allocations).
+        # Accepts an mss ScreenShot or a BGRA ndarray. The returned buffer is overwritten by the next call.
+        frame = screenshot if isinstance(screenshot, np.ndarray) else self.bgra_view(screenshot)
+        return self.normalize(self.resample(frame), out)
+
+    def preprocess_regions(self, frames, out=None, pixels=None):
+        # Resample and normalize region i into row i of `out` (default: input_buffer);
+        # with `pixels`, the resampled BGRA frames are copied there too (for the recorder).
+        if out is None:
+            out = self.input_buffer
+        for i, frame in enumerate(frames):
+            resampled = self.resample(frame)
+            if pixels is not None:
+                np.copyto(pixels[i], resampled)
+            self.normalize(resampled, out[i:i + 1])
+        return out
+
     def softmax(self, x):
         exp_x = np.exp(x - np.max(x))
         return exp_x / np.sum(exp_x)
 
+    def infer(self, image):
+        # Raw model output. With IOBinding this is the persistent output buffer,
+        # which the next call overwrites.
+        if self.io_binding is None:
+            return self.ort_session.run(None, {self.input_name: image})[0]
+        if image.dtype != np.float32 or not image.flags.c_contiguous or image.shape != self.input_buffer.shape:
+            np.copyto(self.input_buffer, image)
+            image = self.input_buffer
+        self._bind_input(image)
+        self.ort_session.run_with_iobinding(self.io_binding)
+        return self.output_buffer
+
     def predict(self, image):
-        ort_inputs = {self.input_name: image}
-        ort_outs = self.ort_session.run(None, ort_inputs)
-        logits = np.squeeze(ort_outs)
-        pred = int(np.argmax(logits))
-        probs = self.softmax(logits)
-        probs = np.round(probs, decimals=3).tolist()
-        # Map probabilities to their description labels.
-        probs_dict = {self.pred_dict[i]["desc"]: probs[i] for i in range(len(probs))}
-        should_hit = self.pred_dict[pred]["hit"]
-        desc = self.pred_dict[pred]["desc"]
-        return pred, desc, probs_dict, should_hit
+        # Copy the logits out of the (reused) output buffer; everything else is decoded lazily.
+        cascade = self.cascade
+        if cascade is not None and not cascade.should_run(image):
+            return self.none_prediction()
+        prediction = self.decode(self.infer(image))
+        if cascade is not None:
+            cascade.full_result(prediction.pred)
+        return prediction
+
+    def predict_regions(self, images):
+        # One Prediction per capture region: a single batched run, or one run per region
+        # when the model's batch dimension is fixed.
+        if self.batched:
+            output = self.infer(images)
+            return [self.decode(row) for row in output.reshape(len(images), -1)]
+        return [self.decode(self.infer(images[i:i + 1])) for i in range(len(images))]
+
+    def decode(self, output):
+        # Copy the logits out of the model output and pick the class.
+        logits = output.reshape(-1).copy()
+        pred = int(logits.argmax())
+        return Prediction(logits, pred, self.HIT_MASK.item(pred))
+
+    def none_prediction(self):
+        # Stand-in "None" result for frames the cascade gate rejected (shared, read-only).
+        # Marked as gated: its logits are made up, not model output.
+        if self._none_prediction is None:
+            logits = np.full(len(self.DESCRIPTIONS), -10.0, dtype=np.float32)
+            logits[0] = 10.0
+            logits.flags.writeable = False
+            self._none_prediction = Prediction(logits, 0, False, gated=True)
+        return self._none_prediction
+
+
+class CascadeGate:
+    """Cheap first stage of a two-stage cascade: "is anything target-like on screen?".
+
+    Runs a small ONNX model on a nearest-neighbour downscale of the normalized model
+    input (the gate must declare a static input height and width). Its
+    output can be a single logit (sigmoid), two logits ([none, target], softmax) or the
+    full class logits (1 - P(None)). Frames scoring below `threshold` skip the full
+    classifier. The full model still runs every `refresh_every` frames, so it stays hot
+    and gate misses are bounded, and it keeps running on every frame for as long as it
+    predicts something other than None, so the gate only adds latency on the first frame
+    of a skill check.
+    """
+
+    def __init__(self, onnx_filepath, providers=None, threshold=0.2, refresh_every=15, nb_threads=None):
+        sess_options = SessionOptions()
+        sess_options.graph_optimization_level = GraphOptimizationLevel.ORT_ENABLE_ALL
+        sess_options.execution_mode = ExecutionMode.ORT_SEQUENTIAL
+        if nb_threads:
+            sess_options.intra_op_num_threads = nb_threads
+        self.session = InferenceSession(onnx_filepath, providers=providers or ["CPUExecutionProvider"],
+                                        sess_options=sess_options)
+        self.model_path = onnx_filepath
+        gate_input = self.session.get_inputs()[0]
+        if len(gate_input.shape) != 4 or not all(isinstance(d, int) for d in gate_input.shape[1:]):
+            raise ValueError(f"Cascade gate {os.path.basename(onnx_filepath)} needs a static (N, C, H, W) input "
+                             f"shape, got {gate_input.shape}")
+        shape = [d if isinstance(d, int) else 1 for d in gate_input.shape]
+        self.input_name = gate_input.name
+        self.input_buffer = np.empty(shape, dtype=np.float32)
+        self._gather_key = None
+        self._gather_index = None
+        self.threshold = threshold
+        self.refresh_every = refresh_every
+        self.skipped = 0
+        self.passed = 0
+        self._since_full = 0
+        self._active = False
+
+    def _downscale(self, image):
+        # Nearest-neighbour resample of the (1, 3, 224, 224) input to the gate's size,
+        # sampling pixel centres across the whole frame (as AI_model.resample does).
+        height, width = self.input_buffer.shape[2:]
+        source = image.shape[2:]
+        if self._gather_key != source:
+            rows = ((np.arange(height) + 0.5) * source[0] / height).astype(np.intp)
+            cols = ((np.arange(width) + 0.5) * source[1] / width).astype(np.intp)
+            self._gather_index = (rows[:, None] * source[1] + cols[None, :]).reshape(-1)
+            self._gather_key = source
+        flat = image.reshape(image.shape[0], image.shape[1], -1)
+        np.take(flat, self._gather_index, axis=2, out=self.input_buffer.reshape(flat.shape[:2] + (-1,)))
+        return self.input_buffer
+
+    def score(self, image):
+        # Probability that the frame shows a target.
+        out = self.session.run(None, {self.input_name: self._downscale(image)})[0].reshape(-1)
+        if out.size == 1:
+            return float(1.0 / (1.0 + np.exp(-out[0])))
+        exp_x = np.exp(out - out.max())
+        probs = exp_x / exp_x.sum()
+        return float(probs[1]) if out.size == 2 else float(1.0 - probs[0])
+
+    def should_run(self, image):
+        # Whether the full classifier should run on this frame.
+        self._since_full += 1
+        if self._active or self._since_full >= self.refresh_every or self.score(image) >= self.threshold:
+            self.passed += 1
+            return True
+        self.skipped += 1
+        return False
+
+    def full_result(self, pred):
+        self._since_full = 0
+        self._active = pred != 0
+
+
+class Prediction:
+    """Result of AI_model.predict: raw logits, argmax class and hit flag.
+
+    Probabilities and descriptions are only computed when accessed. Iterating yields the
+    legacy (pred, desc, probs_dict, should_hit) tuple so existing unpacking keeps working.
+    `gated` marks a result that stands in for a frame the model was not run on (cascade or
+    change gate); consumers that learn from logits must skip it.
+    """
+    __slots__ = ("logits", "pred", "hit", "gated", "_probs")
+
+    def __init__(self, logits, pred, hit, gated=False):
+        self.logits = logits
+        self.pred = pred
+        self.hit = hit
+        self.gated = gated
+        self._probs = None
+
+    def as_gated(self):
+        # This result reused for a later frame that was not evaluated.
+        return Prediction(self.logits, self.pred, self.hit, gated=True)
+
+    @property
+    def desc(self):
+        return AI_model.DESCRIPTIONS[self.pred]
+
+    @property
+    def probs(self):
+        # Softmax over the logits, cached after the first access.
+        if self._probs is None:
+            exp_x = np.exp(self.logits - self.logits.max())
+            self._probs = exp_x / exp_x.sum()
+        return self._probs
+
+    @property
+    def probs_dict(self):
+        # Map rounded probabilities to their description labels.
+        return dict(zip(AI_model.DESCRIPTIONS, np.round(self.probs, decimals=3).tolist()))
+
+    def __iter__(self):
+        return iter((self.pred, self.desc, self.probs_dict, self.hit))
+
+    def __repr__(self):
+        return f"Prediction(pred={self.pred}, desc={self.desc!r}, hit={self.hit}, gated={self.gated})"
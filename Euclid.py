@@ -1,19 +1,14 @@
 import sys
 import os
-import time
 import logging
 import random
 import ctypes
 import json
-import numpy as np
-from PIL import Image  # Pillow must be installed
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QPushButton, QVBoxLayout, QLabel,
     QHBoxLayout, QProgressBar, QSlider, QSizePolicy, QDialog
 )
 from PyQt5.QtCore import Qt, QThread, pyqtSlot, pyqtSignal, QPoint, QTimer, QEvent, QPropertyAnimation, QEasingCurve
-import psutil
-import requests
 import subprocess
 
 # ----- Auto Update Config & Functions -----
@@ -24,44 +19,79 @@ UPDATE_EXE_URL = "https://github.com/ItsK9ick/Euclid/releases/download/v1.0.0/Eu
 # Path to the updater executable (which should be packaged alongside Euclid)
 UPDATER_EXE_PATH = "updater.exe"
 
-def perform_update_exe():
-    """Download the new executable and launch the updater."""
+# Optional sha256sum-style file published next to the executable; without it only the size is checked
+UPDATE_SHA256_URL = UPDATE_EXE_URL + ".sha256"
+
+class UpdateChecker(QThread):
+    """Fetches the remote version in the background so an offline or slow network never delays startup."""
+    update_available = pyqtSignal(str)
+
+    def run(self):
+        try:
+            from dbd.updates import fetch_remote_version
+            remote_version = fetch_remote_version(REMOTE_VERSION_URL)
+            if remote_version != BUILD_VERSION:
+                self.update_available.emit(remote_version)
+        except Exception as e:
+            print("Update check failed:", e)
+
+class UpdateDownloader(QThread):
+    """Streams the new executable to disk (resumable), verifies it and reports progress."""
+    log_signal = pyqtSignal(str)
+    progress_signal = pyqtSignal(int)
+    downloaded = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._percent = -1
+
+    def report(self, done, total):
+        percent = int(done * 100 / total) if total else 0
+        if percent != self._percent:
+            self._percent = percent
+            self.progress_signal.emit(percent)
+
+    def run(self):
+        try:
+            from dbd.updates import download, fetch_checksum
+            sha256 = fetch_checksum(UPDATE_SHA256_URL)
+            if sha256 is None:
+                self.log_signal.emit("No update checksum published; checking size only.")
+            self.log_signal.emit("⬇ Downloading update...")
+            update_path = os.path.join(os.getcwd(), "update_temp.exe")
+            download(UPDATE_EXE_URL, update_path, sha256=sha256, progress=self.report)
+            self.downloaded.emit(update_path)
+        except Exception as e:
+            self.log_signal.emit(f"Update failed: {e}")
+
+def prompt_update(remote_version):
+    """Ask whether to install remote_version now; returns True if accepted."""
+    dialog = QDialog()
+    dialog.setWindowTitle("Update Available")
+    dialog.setWindowFlags(Qt.Dialog | Qt.FramelessWindowHint)
+    layout = QVBoxLayout(dialog)
+    label = QLabel(f"A new version ({remote_version}) is available.\nUpdate now?", dialog)
+    label.setAlignment(Qt.AlignCenter)
+    layout.addWidget(label)
+    btn_layout = QHBoxLayout()
+    btn_update = QPushButton("Update Now", dialog)
+    btn_later = QPushButton("Later", dialog)
+    btn_layout.addWidget(btn_update)
+    btn_layout.addWidget(btn_later)
+    layout.addLayout(btn_layout)
+    btn_update.clicked.connect(dialog.accept)
+    btn_later.clicked.connect(dialog.reject)
+    return dialog.exec_() == QDialog.Accepted
+
+def launch_updater(update_path):
+    """Hand the verified executable to the updater and exit."""
     try:
-        response = requests.get(UPDATE_EXE_URL)
-        update_path = os.path.join(os.getcwd(), "update_temp.exe")
-        with open(update_path, "wb") as f:
-            f.write(response.content)
         subprocess.Popen([UPDATER_EXE_PATH, update_path])
     except Exception as e:
         print("Update failed:", e)
+        return
     os._exit(0)
 
-def check_for_updates():
-    """Check remote version; if different from BUILD_VERSION, prompt update."""
-    try:
-        remote_version = requests.get(REMOTE_VERSION_URL, timeout=5).text.strip()
-        if remote_version != BUILD_VERSION:
-            # Simple prompt using a QDialog
-            dialog = QDialog()
-            dialog.setWindowTitle("Update Available")
-            dialog.setWindowFlags(Qt.Dialog | Qt.FramelessWindowHint)
-            layout = QVBoxLayout(dialog)
-            label = QLabel(f"A new version ({remote_version}) is available.\nUpdate now?", dialog)
-            label.setAlignment(Qt.AlignCenter)
-            layout.addWidget(label)
-            btn_layout = QHBoxLayout()
-            btn_update = QPushButton("Update Now", dialog)
-            btn_later = QPushButton("Later", dialog)
-            btn_layout.addWidget(btn_update)
-            btn_layout.addWidget(btn_later)
-            layout.addLayout(btn_layout)
-            btn_update.clicked.connect(dialog.accept)
-            btn_later.clicked.connect(dialog.reject)
-            if dialog.exec_() == QDialog.Accepted:
-                perform_update_exe()
-    except Exception as e:
-        print("Update check failed:", e)
-
 # ----- Load Configuration -----
 CONFIG_FILE = "euclid_config.json"
 default_config = {
@@ -74,7 +104,49 @@ default_config = {
     "space_key": 32,
     "cooldown_safe": 1.5,   # seconds (for Safe mode)
     "cooldown_risky": 1.0,  # seconds (for Risky mode)
-    "fps_limit": 60
+    "autotune": True,            # benchmark session settings once per model/machine (cached in euclid_autotune.json)
+    "model_variant": "auto",     # "auto", "fp32", "int8" or "fp16" (see dbd.model_tools)
+    "variant_tolerance": 0.01,   # max disagreement with FP32 for "auto" to accept a variant
+    "cascade": {            # tiny pre-filter model; the full classifier only runs when it sees a target
+        "enabled": False,
+        "model": "model.gate.onnx",
+        "threshold": 0.2,       # gate probability needed to run the full model
+        "refresh_every": 15     # run the full model at least every N frames regardless
+    },
+    "capture_backend": "auto",   # "auto", "mss" or "xshm" (X11 shared memory, Linux)
+    "capture_regions": [],   # [] = centred square on the primary screen; else list of {"monitor"?, "left", "top", "width", "height"}
+    "fps_limit": 60,        # capture rate while a target is on screen
+    "idle_fps": 20,         # capture rate after "None" has been predicted for idle_after seconds
+    "idle_after": 2.0,
+    "change_gate": {        # reuse the last prediction when the frame has not changed
+        "enabled": False,
+        "pixel_threshold": 16,
+        "min_pixels": 4,
+        "max_reuse": 30
+    },
+    "latency_compensation": {  # time presses from the hit-probability trend instead of pressing on detection
+        "enabled": False,
+        "offset_safe": 0.0,     # seconds added to the predicted window opening (negative = earlier)
+        "offset_risky": 0.0
+    },
+    "resource_sampling": {  # process CPU / GPU load, memory and clocks, exported with the stats
+        "enabled": True,
+        "interval": 1.0,        # seconds between samples (raised automatically if sampling gets slow)
+        "capacity": 600         # samples kept; older ones are overwritten
+    },
+    "recorder": {           # save frames + predictions around detections/presses (for tuning and retraining)
+        "enabled": False,
+        "directory": "euclid_recordings",
+        "before": 30,           # frames kept before a detection or press
+        "after": 30,            # frames kept after it
+        "capacity": 256         # in-flight ring size in frames (~200 KB each)
+    },
+    "engine_process": {     # run capture + inference + key presses in a separate process, away from the GUI
+        "enabled": False,
+        "cpu_affinity": [],     # CPU indices to pin the engine to, e.g. [2, 3]; empty = all
+        "priority": "high"      # "normal", "above_normal" or "high"
+    },
+    "stats_export": ""      # e.g. "euclid_stats.json" or ".csv"; written when monitoring stops
 }
 if not os.path.exists(CONFIG_FILE):
     with open(CONFIG_FILE, "w") as f:
@@ -84,87 +156,74 @@ with open(CONFIG_FILE, "r") as f:
 # Global parameters from config
 # Mode: RISK_MODE==0 is RISKY (no delay); RISK_MODE==1 is SAFE (with cooldown)
 RISK_MODE = 0  
-COOLDOWN_SAFE = config.get("cooldown_safe", 1.5)
-COOLDOWN_RISKY = config.get("cooldown_risky", 1.0)
-FPS_LIMIT = config.get("fps_limit", 60)
-SPACE_KEY = config.get("space_key", 32)
+# Everything else is read by the engine (dbd.engine), which falls back to defaults per key
+ENGINE_SETTINGS = dict(default_config, **config)
+ENGINE_PROCESS = config.get("engine_process", default_config["engine_process"])
 keybinds = config.get("keybinds", default_config["keybinds"])
+BASE_PATH = sys._MEIPASS if getattr(sys, 'frozen', False) else os.getcwd()
+
+# ----------------- ModelLoader -----------------
+class ModelLoader(QThread):
+    """Builds, tunes and warms up the inference session in the background at startup,
+    so pressing Start only has to launch the monitor loop."""
+    log_signal = pyqtSignal(str)
 
-# ----- Initialize NVML for GPU monitoring (if needed) -----
-try:
-    import pynvml
-    pynvml.nvmlInit()
-    NVML_AVAILABLE = True
-except Exception:
-    NVML_AVAILABLE = False
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.ai_model = None
+        self.provider = None
+
+    def run(self):
+        try:
+            from dbd.engine import load_model
+            ai_model, provider = load_model(ENGINE_SETTINGS, BASE_PATH, log=self.log_signal.emit)
+            if ai_model is not None:
+                self.ai_model = ai_model
+                self.provider = provider
+                self.log_signal.emit(f"Euclid ready. Provider: {provider} ({os.path.basename(ai_model.model_path)})")
+        except Exception as e:
+            self.log_signal.emit(f"Model load error: {e}")
 
 # ----------------- MonitorWorker -----------------
 class MonitorWorker(QThread):
     log_signal = pyqtSignal(str)
     progress_signal = pyqtSignal(int)
+    stats_signal = pyqtSignal(str)
     
-    def __init__(self, parent=None):
+    def __init__(self, loader, parent=None):
         super().__init__(parent)
+        self.loader = loader
+        self.engine = None
         self.running = True
-        self.last_hit_time = None
 
     def run(self):
         try:
-            from dbd.AI_model import AI_model
-            from dbd.utils.directkeys import PressKey, ReleaseKey
-            space_key = SPACE_KEY
-
-            base_path = sys._MEIPASS if getattr(sys, 'frozen', False) else os.getcwd()
-            onnx_model = os.path.join(base_path, "model.onnx")
-            if not os.path.exists(onnx_model):
-                self.log_signal.emit("❌ model.onnx not found!")
-                return
+            from dbd.engine import Engine, EngineConfig
 
-            use_gpu = True
-            nb_cpu_threads = 4
-            try:
-                ai_model = AI_model(onnx_model, use_gpu, nb_cpu_threads)
-                provider = ai_model.check_provider()
-            except Exception as e:
-                self.log_signal.emit(f"GPU mode failed: {e}. Falling back to CPU.")
-                use_gpu = False
-                nb_cpu_threads = 2
-                ai_model = AI_model(onnx_model, use_gpu, nb_cpu_threads)
-                provider = ai_model.check_provider()
+            # The session is normally built and warmed by ModelLoader before Start is pressed.
+            if self.loader.isRunning():
+                self.log_signal.emit("⏳ Waiting for the model to finish loading...")
+            self.loader.wait()
+            ai_model = self.loader.ai_model
+            provider = self.loader.provider
+            if ai_model is None:
+                self.log_signal.emit("❌ Euclid engine is not available.")
+                return
 
-            self.log_signal.emit(f"Euclid Provider: {provider}")
+            self.log_signal.emit(f"Euclid Provider: {provider} ({os.path.basename(ai_model.model_path)})")
             self.progress_signal.emit(20)
+            self.engine = Engine(ai_model, EngineConfig.from_settings(dict(ENGINE_SETTINGS, risk_mode=RISK_MODE)),
+                                 provider, log=self.log_signal.emit, on_stats=self.stats_signal.emit)
             self.log_signal.emit("🚀 Euclid Engine initialized. Monitoring started.")
             self.progress_signal.emit(100)
-            
-            while self.running:
-                frame_start = time.perf_counter()
-                screenshot = ai_model.grab_screenshot()
-                image_pil = ai_model.screenshot_to_pil(screenshot)
-                try:
-                    image_np = np.array(image_pil, dtype=np.float32) / 255.0
-                    if image_np.ndim == 3:
-                        image_np = np.transpose(image_np, (2, 0, 1))
-                        image_np = np.expand_dims(image_np, axis=0)
-                except Exception as e:
-                    self.log_signal.emit(f"Image conversion error: {e}")
-                    continue
-
-                pred, desc, probs, should_hit = ai_model.predict(image_np)
-                current_time = time.perf_counter()
-                # Determine cooldown based on mode: if SAFE (RISK_MODE==1) use COOLDOWN_SAFE; else (RISKY) use COOLDOWN_RISKY
-                cooldown = COOLDOWN_SAFE if RISK_MODE == 1 else COOLDOWN_RISKY
-                if should_hit and (self.last_hit_time is None or (current_time - self.last_hit_time) >= cooldown):
-                    PressKey(space_key)
-                    ReleaseKey(space_key)
-                    self.last_hit_time = time.perf_counter()
-                    self.log_signal.emit("🎯 Euclid triggered action!")
-                elapsed = time.perf_counter() - frame_start
-                sleep_time = max(1.0 / FPS_LIMIT - elapsed, 0)
-                time.sleep(sleep_time)
+            self.engine.run(lambda: self.running)
         except Exception as e:
             self.log_signal.emit(f"Monitor Error: {e}")
 
+    def set_risk_mode(self, mode):
+        if self.engine is not None:
+            self.engine.risk_mode = mode
+
     def stop(self):
         self.running = False
 
@@ -173,16 +232,92 @@ class EuclidOverlayUI(QWidget):
     def __init__(self):
         super().__init__()
         self.monitor_worker = None
+        self.model_loader = None
+        self.update_checker = None
+        self.update_downloader = None
+        self.engine_process = None
+        self.engine_running = False
         self._drag_active = False
         self._drag_offset = QPoint(0, 0)
         self.bottom_visible = True  # Controls visibility of the bottom UI
         self.initUI()
         self.installEventFilter(self)
+        # Build and warm the model while the overlay is idle so Start is immediate.
+        if ENGINE_PROCESS.get("enabled", False):
+            self.start_engine_process()
+        else:
+            self.start_model_loader()
+
+    def start_model_loader(self):
+        self.model_loader = ModelLoader()
+        self.model_loader.log_signal.connect(self.update_log)
+        self.model_loader.start()
+
+    def start_engine_process(self):
+        from dbd.engine_process import EngineProcess
+        self.engine_process = EngineProcess(ENGINE_SETTINGS, BASE_PATH, ENGINE_PROCESS.get("cpu_affinity"),
+                                            ENGINE_PROCESS.get("priority", "high"))
+        self.engine_process.launch()
+        self.engine_process.set_risk_mode(RISK_MODE)
+        if not hasattr(self, "engine_timer"):
+            # Engine log/stats messages are drained here, on the GUI thread.
+            self.engine_timer = QTimer(self)
+            self.engine_timer.timeout.connect(self.poll_engine)
+            self.engine_timer.start(50)
+
+    def poll_engine(self):
+        for kind, text in self.engine_process.poll():
+            if kind == "log":
+                self.update_log(text)
+            elif kind == "stats" and self.engine_running:
+                self.update_stats(text)
+            elif kind == "failed":
+                self.update_log(text)
+                self.engine_running = False
+                self.toggle_btn.setText("Start")
+                self.stats_label.setText("")
+                self.loading_bar.setValue(0)
+
+    def sync_risk_mode(self):
+        if self.engine_process is not None:
+            self.engine_process.set_risk_mode(RISK_MODE)
+        if self.monitor_worker is not None:
+            self.monitor_worker.set_risk_mode(RISK_MODE)
+
+    def check_for_updates(self):
+        self.update_checker = UpdateChecker()
+        self.update_checker.update_available.connect(self.on_update_available)
+        self.update_checker.start()
+
+    @pyqtSlot(str)
+    def on_update_available(self, remote_version):
+        if self.update_downloader is not None or not prompt_update(remote_version):
+            return
+        self.update_downloader = UpdateDownloader()
+        self.update_downloader.log_signal.connect(self.update_log)
+        self.update_downloader.progress_signal.connect(self.update_loading)
+        self.update_downloader.downloaded.connect(self.on_update_downloaded)
+        self.update_downloader.finished.connect(self.on_update_finished)
+        self.update_downloader.start()
+
+    @pyqtSlot(str)
+    def on_update_downloaded(self, update_path):
+        self.stop_monitor()
+        # launch_updater exits with os._exit, which skips multiprocessing cleanup; the engine
+        # process (Euclid.exe itself when frozen) must be gone before the updater replaces files.
+        if self.engine_process is not None:
+            self.engine_process.shutdown()
+            self.engine_process = None
+        launch_updater(update_path)
+
+    def on_update_finished(self):
+        # Reached only when the download failed; allow another attempt on the next check.
+        self.update_downloader = None
 
     def initUI(self):
         # Discreet overlay: frameless, hidden from Alt‑Tab/taskbar
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.Tool | Qt.WindowStaysOnTopHint)
-        self.resize(300, 120)
+        self.resize(300, 135)
         self.setAttribute(Qt.WA_TranslucentBackground, True)
         self.setStyleSheet("""
             QWidget { background-color: rgba(0,0,0,0); color: wheat; font-size: 12px; }
@@ -220,6 +355,12 @@ class EuclidOverlayUI(QWidget):
         self.loading_bar.setStyleSheet("QProgressBar::chunk { background: wheat; }")
         main_layout.addWidget(self.loading_bar)
 
+        # Live perf line (FPS, p99 latency, provider), refreshed by the engine every 0.5 s
+        self.stats_label = QLabel("", self)
+        self.stats_label.setAlignment(Qt.AlignCenter)
+        self.stats_label.setStyleSheet("font-size: 10px;")
+        main_layout.addWidget(self.stats_label)
+
         # Bottom Bar: Start/Stop button, Title, [SFM] toggle
         self.bottom_bar = QHBoxLayout()
         self.bottom_bar.setSpacing(5)
@@ -301,6 +442,7 @@ class EuclidOverlayUI(QWidget):
     def update_risk_mode(self, value):
         global RISK_MODE
         RISK_MODE = value
+        self.sync_risk_mode()
         mode = "Safe" if RISK_MODE == 1 else "Risky"
         self.log_label.setText(f"Mode: {mode}")
     
@@ -337,7 +479,7 @@ class EuclidOverlayUI(QWidget):
     
     def toggle_monitor(self):
         try:
-            if self.monitor_worker is None:
+            if self.monitor_worker is None and not self.engine_running:
                 self.start_monitor()
             else:
                 self.stop_monitor()
@@ -347,9 +489,24 @@ class EuclidOverlayUI(QWidget):
     def start_monitor(self):
         self.toggle_btn.setText("Stop")
         self.log_label.setText("Starting Euclid...")
-        self.monitor_worker = MonitorWorker()
+        if self.engine_process is not None:
+            if not self.engine_process.is_alive():
+                # The engine failed or exited earlier; start a fresh one.
+                self.engine_process.shutdown(0.5)
+                self.start_engine_process()
+            elif not self.engine_process.ready:
+                self.log_label.setText("⏳ Waiting for the model to finish loading...")
+            self.engine_process.start()
+            self.engine_running = True
+            self.loading_bar.setValue(100)
+            return
+        if self.model_loader.isFinished() and self.model_loader.ai_model is None:
+            # The background load failed earlier; try again.
+            self.start_model_loader()
+        self.monitor_worker = MonitorWorker(self.model_loader)
         self.monitor_worker.log_signal.connect(self.update_log)
         self.monitor_worker.progress_signal.connect(self.update_loading)
+        self.monitor_worker.stats_signal.connect(self.update_stats)
         self.monitor_worker.start()
     
     def stop_monitor(self):
@@ -360,8 +517,12 @@ class EuclidOverlayUI(QWidget):
             except Exception as e:
                 self.log_label.setText(f"Error stopping monitor: {e}")
             self.monitor_worker = None
+        if self.engine_process is not None:
+            self.engine_process.stop()
+            self.engine_running = False
         self.toggle_btn.setText("Start")
         self.log_label.setText("Euclid stopped.")
+        self.stats_label.setText("")
         self.loading_bar.setValue(0)
     
     @pyqtSlot(str)
@@ -372,6 +533,10 @@ class EuclidOverlayUI(QWidget):
     @pyqtSlot(int)
     def update_loading(self, value):
         self.loading_bar.setValue(value)
+
+    @pyqtSlot(str)
+    def update_stats(self, text):
+        self.stats_label.setText(text)
     
     def emergency_stop(self):
         if self.monitor_worker:
@@ -380,6 +545,8 @@ class EuclidOverlayUI(QWidget):
                 self.monitor_worker.wait(3000)
             except Exception as e:
                 self.log_label.setText("Error during emergency stop: " + str(e))
+        if self.engine_process is not None:
+            self.engine_process.shutdown(1.0)
         self.hide()
         QApplication.quit()
         os._exit(0)  # Force termination so that it fully closes
@@ -402,6 +569,7 @@ class EuclidOverlayUI(QWidget):
     def toggle_risk_mode(self):
         global RISK_MODE
         RISK_MODE = 0 if RISK_MODE == 1 else 1
+        self.sync_risk_mode()
         mode = "Safe" if RISK_MODE == 1 else "Risky"
         self.log_label.setText(f"Mode toggled: {mode}")
         self.sr_slider.setValue(RISK_MODE)
@@ -411,16 +579,14 @@ class EuclidOverlayUI(QWidget):
 
 # ----- Main: Auto Update Check and Application Launch -----
 if __name__ == '__main__':
-    # Check for updates before starting (this will prompt and update if a new version is available)
-    try:
-        check_for_updates()
-    except Exception as e:
-        print("Auto update check failed:", e)
-    
+    import multiprocessing
+    multiprocessing.freeze_support()  # engine process in frozen (PyInstaller) builds
     app = QApplication(sys.argv)
     window = EuclidOverlayUI()
     window.installEventFilter(window)
     window.show()
+    # Runs in the background; the overlay prompts if a new version is available
+    window.check_for_updates()
     try:
         import keyboard
         keyboard.add_hotkey(keybinds.get('toggle_monitor', 'F2'), lambda: window.toggle_monitor())
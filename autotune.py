@@ -0,0 +1,169 @@
+"""ONNX Runtime session autotuner.
+
+Benchmarks candidate session configurations (provider, intra/inter-op threads, sequential vs
+parallel execution, thread spinning) on synthetic 224x224 input and keeps the one with the
+lowest p99 latency. Results are cached per hardware and per hash of the model files the
+session actually loads (the variant each provider resolves to), so later launches reuse
+them without tuning:
+
+    python -m dbd.autotune model.onnx [--force]
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+import onnxruntime
+
+from dbd.AI_model import AI_model, OFFLINE_REGION, select_variant
+
+CACHE_FILE = "euclid_autotune.json"
+PREFERRED_PROVIDERS = ("CUDAExecutionProvider", "DmlExecutionProvider", "CPUExecutionProvider")
+
+
+def model_hash(onnx_filepath):
+    digest = hashlib.sha256()
+    with open(onnx_filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def hardware_fingerprint():
+    # CPU, core count, ORT build and GPU (when NVML is available).
+    parts = [platform.machine(), platform.processor() or platform.system(), str(os.cpu_count()),
+             onnxruntime.__version__, ",".join(onnxruntime.get_available_providers())]
+    try:
+        import pynvml
+        pynvml.nvmlInit()
+        name = pynvml.nvmlDeviceGetName(pynvml.nvmlDeviceGetHandleByIndex(0))
+        parts.append(name.decode() if isinstance(name, bytes) else name)
+    except Exception:
+        pass
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()[:16]
+
+
+def thread_counts(cpu_count=None):
+    cpu_count = cpu_count or os.cpu_count() or 1
+    return sorted({n for n in (1, 2, 4, cpu_count // 2, cpu_count) if 1 <= n <= cpu_count})
+
+
+def available_providers():
+    return [p for p in PREFERRED_PROVIDERS if p in onnxruntime.get_available_providers()]
+
+
+def cache_key(onnx_filepath, variant="fp32", variant_tolerance=0.01, providers=None):
+    # "<models>:<hardware>", where <models> hashes the file each candidate provider would load
+    # once `variant` is resolved (see AI_model.select_variant), so "auto" is keyed on what it
+    # picks now: a new, re-quantized or re-validated variant file gets tuned afresh.
+    hashes = {}
+    loaded = []
+    for provider in providers or available_providers():
+        path = select_variant(onnx_filepath, provider, variant, variant_tolerance)
+        if path not in hashes:
+            hashes[path] = model_hash(path)
+        loaded.append(f"{provider}={hashes[path]}")
+    models = hashlib.sha256("|".join(loaded).encode()).hexdigest()[:16]
+    return f"{models}:{hardware_fingerprint()}"
+
+
+def candidate_configs(providers=None, cpu_count=None):
+    """First-pass grid: provider x execution mode x intra-op threads, spinning left on."""
+    providers = providers or available_providers()
+    configs = []
+    for provider in providers:
+        # DirectML only runs sequentially.
+        modes = ("sequential",) if provider == "DmlExecutionProvider" else ("sequential", "parallel")
+        for mode in modes:
+            for threads in thread_counts(cpu_count):
+                configs.append({
+                    "provider": provider,
+                    "execution_mode": mode,
+                    "intra_op_threads": threads,
+                    "inter_op_threads": 2 if mode == "parallel" else 1,
+                    "allow_spinning": True,
+                })
+    return configs
+
+
+def benchmark(onnx_filepath, session_config, runs=60, warmup=10, variant="fp32", variant_tolerance=0.01):
+    # p50/p99 inference latency (seconds) of one configuration, or None if it fails to load.
+    try:
+        ai_model = AI_model(onnx_filepath, monitor=OFFLINE_REGION, variant=variant,
+                            variant_tolerance=variant_tolerance, session_config=session_config)
+    except Exception:
+        return None
+    image = np.random.default_rng(0).standard_normal(ai_model.input_buffer.shape, dtype=np.float32)
+    for _ in range(warmup):
+        ai_model.infer(image)
+    timings = np.empty(runs)
+    for i in range(runs):
+        start = time.perf_counter()
+        ai_model.infer(image)
+        timings[i] = time.perf_counter() - start
+    p50, p99 = np.percentile(timings, [50, 99])
+    return float(p50), float(p99)
+
+
+def tune(onnx_filepath, variant="fp32", variant_tolerance=0.01, log=print):
+    """Benchmark all candidates and return (best_config, p50, p99)."""
+    results = []
+
+    def run(config):
+        timing = benchmark(onnx_filepath, config, variant=variant, variant_tolerance=variant_tolerance)
+        if timing is not None:
+            results.append((timing[1], timing[0], config))
+            log(f"{config['provider']:<24}{config['execution_mode']:<12}intra={config['intra_op_threads']:<3}"
+                f"inter={config['inter_op_threads']:<3}spin={int(config['allow_spinning'])}  "
+                f"p50 {timing[0] * 1000:.2f} ms  p99 {timing[1] * 1000:.2f} ms")
+
+    for config in candidate_configs():
+        run(config)
+    if not results:
+        raise RuntimeError("No session configuration could be loaded")
+    # Spinning trades idle CPU for wake-up latency; only worth checking on the winner.
+    run(dict(min(results, key=lambda r: r[0])[2], allow_spinning=False))
+    p99, p50, best = min(results, key=lambda r: r[0])
+    return best, p50, p99
+
+
+def autotune(onnx_filepath, cache_file=CACHE_FILE, variant="fp32", variant_tolerance=0.01, force=False, log=print):
+    """Return the cached session config for this model and machine, tuning it on a cache miss."""
+    key = cache_key(onnx_filepath, variant, variant_tolerance)
+    cache = {}
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, "r") as f:
+                cache = json.load(f)
+        except ValueError:
+            cache = {}
+    if key in cache and not force:
+        return cache[key]["config"]
+
+    log("⏱ Tuning inference session for this machine...")
+    best, p50, p99 = tune(onnx_filepath, variant, variant_tolerance, log=log)
+    cache[key] = {"config": best, "p50_ms": round(p50 * 1000, 3), "p99_ms": round(p99 * 1000, 3),
+                  "tuned_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+    with open(cache_file, "w") as f:
+        json.dump(cache, f, indent=4)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune ONNX Runtime session settings for this machine.")
+    parser.add_argument("model")
+    parser.add_argument("--cache", default=CACHE_FILE)
+    parser.add_argument("--variant", default="fp32", help='Model variant to tune ("auto", "fp32", "int8", "fp16")')
+    parser.add_argument("--force", action="store_true", help="Re-tune even if a cached result exists")
+    args = parser.parse_args(argv)
+    best = autotune(args.model, args.cache, args.variant, force=args.force)
+    print("Selected:", json.dumps(best))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
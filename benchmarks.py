@@ -0,0 +1,213 @@
+"""Micro-benchmarks of the per-frame hot path, checked against a stored baseline.
+
+Each function on the path from screen grab to hit decision is timed in isolation on the
+CPU execution provider with fixed thread counts, at the capture region sizes
+get_monitor_attributes produces for common screens:
+
+    python -m dbd.benchmarks                       # compare with benchmarks_baseline.json
+    python -m dbd.benchmarks --update              # (re)record this machine's baseline
+    python -m dbd.benchmarks --only preprocess --resolutions 4k
+
+Each function runs `repeat` batches of `number` calls; the median and the best batch are
+reported, and regressions are judged on the best batch, which is the least disturbed by
+other load on the machine. Baselines are stored per model hash, hardware fingerprint (see
+dbd.autotune) and thread count, since numbers from another setup mean nothing. The run
+fails with exit code 1 when a function is slower than its baseline by more than
+`tolerance` (and by at least MIN_DELTA_US, to ignore timer noise on sub-µs calls), and
+with exit code 2 when there is no baseline for this model and machine. Run it on an
+otherwise idle machine in performance power mode, like the overlay itself; raise
+--tolerance on shared VMs.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+import onnxruntime
+
+from dbd.AI_model import AI_model, get_monitor_attributes
+from dbd.autotune import hardware_fingerprint, model_hash
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks_baseline.json")
+RESOLUTIONS = {"1080p": (1920, 1080), "1440p": (2560, 1440), "4k": (3840, 2160)}
+DEFAULT_TOLERANCE = 0.25
+MIN_DELTA_US = 2.0
+NO_BASELINE = 2  # exit code when there is nothing to compare against, so CI cannot pass silently
+
+
+class SyntheticScreenshot:
+    """Stand-in for an mss ScreenShot (raw BGRA bytes + size) filled with seeded noise."""
+
+    def __init__(self, width, height, seed=0):
+        rng = np.random.default_rng(seed)
+        self.width = width
+        self.height = height
+        self.size = (width, height)
+        self.bgra = rng.integers(0, 256, (height, width, 4), dtype=np.uint8).tobytes()
+
+
+def measure(func, number=200, repeat=7):
+    # Median and best per-call time in microseconds over `repeat` batches of `number` calls.
+    func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - started) / number * 1e6)
+    return {"median_us": round(float(np.median(timings)), 3), "min_us": round(min(timings), 3)}
+
+
+def cases(ai_model, resolutions):
+    """(name, callable, calls per batch divisor) for every benchmarked function.
+
+    Region-dependent functions are named `<function>@<resolution>`.
+    """
+    try:
+        import PIL  # noqa: F401  (PIL path only)
+        has_pil = True
+    except ImportError:
+        has_pil = False
+
+    for label in resolutions:
+        width, height = RESOLUTIONS[label]
+        region = get_monitor_attributes(width, height)
+        shot = SyntheticScreenshot(region["width"], region["height"])
+        frame = ai_model.bgra_view(shot)
+        if has_pil:
+            # The PIL path resizes with LANCZOS only when the region is not already 224x224.
+            name = "screenshot_to_pil" + ("" if shot.size == (224, 224) else "+resize")
+            yield f"{name}@{label}", lambda shot=shot: ai_model.screenshot_to_pil(shot), 10
+        # Inline conversion used by the monitor loop: resample + normalize into the input buffer.
+        yield f"preprocess@{label}", lambda frame=frame: ai_model.preprocess(frame), 1
+        yield f"resample@{label}", lambda frame=frame: ai_model.resample(frame), 1
+
+    pixels = ai_model.resample(ai_model.bgra_view(SyntheticScreenshot(224, 224)))
+    yield "normalize", lambda: ai_model.normalize(pixels), 1
+    if has_pil:
+        image = ai_model.screenshot_to_pil(SyntheticScreenshot(224, 224))
+        yield "pil_to_numpy", lambda: ai_model.pil_to_numpy(image), 1
+    image = ai_model.preprocess(pixels)
+    feed = {ai_model.input_name: image}
+    yield "session_run", lambda: ai_model.ort_session.run(None, feed), 10
+    output = ai_model.ort_session.run(None, feed)[0]
+    logits = output.reshape(-1)
+    yield "softmax", lambda: ai_model.softmax(logits), 1
+    yield "decode", lambda: ai_model.decode(output), 1
+    # Probabilities are cached per Prediction, so time them on a fresh one.
+    yield "decode+probs_dict", lambda: ai_model.decode(output).probs_dict, 1
+
+
+def run_benchmarks(onnx_filepath, resolutions=tuple(RESOLUTIONS), number=200, repeat=7, threads=1, only=None,
+                   baseline=None, tolerance=DEFAULT_TOLERANCE, confirm=2, log=print):
+    """Time every case; returns {name: {"median_us", "min_us"}}.
+
+    With a `baseline`, a function that looks regressed is measured again up to `confirm`
+    more times and keeps its best result, so one burst of background load does not fail
+    the run. Without one (recording a baseline), every function is measured `confirm + 1`
+    times and the typical (median) run is kept rather than the luckiest.
+    """
+    ai_model = AI_model(onnx_filepath, use_gpu=False, nb_cpu_threads=threads, use_io_binding=False,
+                        variant="fp32", capture="synthetic")
+    results = {}
+    for name, func, divisor in cases(ai_model, resolutions):
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        calls = max(1, number // divisor)
+        if not baseline:
+            runs = sorted((measure(func, calls, repeat) for _ in range(confirm + 1)), key=lambda r: r["min_us"])
+            result = results[name] = runs[len(runs) // 2]
+            log(f"{name:<32} median {result['median_us']:>10.2f} µs   min {result['min_us']:>10.2f} µs")
+            continue
+        result = measure(func, calls, repeat)
+        for _ in range(confirm):
+            if not compare({name: result}, baseline, tolerance):
+                break
+            retry = measure(func, calls, repeat)
+            if retry["min_us"] < result["min_us"]:
+                result = retry
+        results[name] = result
+        log(f"{name:<32} median {result['median_us']:>10.2f} µs   min {result['min_us']:>10.2f} µs")
+    return results
+
+
+def environment():
+    return {
+        "machine": f"{platform.machine()} {platform.processor() or platform.system()} x{os.cpu_count()}",
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "onnxruntime": onnxruntime.__version__,
+    }
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    # (name, baseline µs, current µs) for every function slower than the baseline allows.
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        before, now = reference["min_us"], result["min_us"]
+        if now > before * (1 + tolerance) and now - before > MIN_DELTA_US:
+            regressions.append((name, before, now))
+    return regressions
+
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Euclid per-frame hot path against a stored baseline.")
+    parser.add_argument("--model", default="model.onnx")
+    parser.add_argument("--resolutions", nargs="+", choices=tuple(RESOLUTIONS), default=list(RESOLUTIONS))
+    parser.add_argument("--only", nargs="+", help="Only run functions whose name starts with one of these")
+    parser.add_argument("--number", type=int, default=200, help="Calls per timed batch")
+    parser.add_argument("--repeat", type=int, default=7, help="Timed batches per function")
+    parser.add_argument("--threads", type=int, default=1, help="ONNX Runtime CPU threads")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown (0.25 = 25%%)")
+    parser.add_argument("--confirm", type=int, default=2, help="Re-measurements before reporting a regression")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--update", action="store_true", help="Store these results as this machine's baseline")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args(argv)
+
+    key = f"{model_hash(args.model)}:{hardware_fingerprint()}:threads={args.threads}"
+    baselines = load_baselines(args.baseline)
+    entry = None if args.update else baselines.get(key)
+    results = run_benchmarks(args.model, args.resolutions, args.number, args.repeat, args.threads, args.only,
+                             entry["results"] if entry else None, args.tolerance, args.confirm)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=4)
+
+    if args.update:
+        entry = baselines.get(key, {"results": {}})
+        entry["environment"] = environment()
+        entry["results"].update(results)
+        baselines[key] = entry
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=4, sort_keys=True)
+        print(f"Baseline for {key} saved to {args.baseline}")
+        return 0
+
+    if entry is None:
+        print(f"No baseline for this model and machine ({key}); record one with --update.")
+        return NO_BASELINE
+    regressions = compare(results, entry["results"], args.tolerance)
+    for name, before, now in regressions:
+        print(f"REGRESSION {name}: {before:.2f} µs -> {now:.2f} µs (+{(now / before - 1) * 100:.0f}%)")
+    if regressions:
+        return 1
+    print(f"No regressions beyond {args.tolerance:.0%} against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
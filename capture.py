@@ -0,0 +1,355 @@
+"""Capture backends: where AI_model gets its BGRA frames from.
+
+Every backend has the same small interface:
+
+    backend.setup(region)        # {"top", "left", "width", "height"}; may be called again
+    frame = backend.allocate()   # (height, width, 4) uint8 buffer of the right shape
+    t = backend.grab_into(frame) # fill it, return the perf_counter time of the grab
+    backend.close()
+
+Screen backends open their display handles lazily on the first grab, in the thread that
+grabs, because neither mss nor Xlib handles may be shared across threads. File and
+synthetic sources need no display, so the whole engine can run deterministically on a
+headless machine for testing and profiling.
+"""
+import ctypes
+import ctypes.util
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+
+def to_bgra(frame):
+    # Normalize any uint8 RGB/BGRA frame to the contiguous BGRA layout mss produces.
+    frame = np.asarray(frame, dtype=np.uint8)
+    if frame.ndim != 3 or frame.shape[2] not in (3, 4):
+        raise ValueError(f"Expected an (H, W, 3|4) frame, got {frame.shape}")
+    if frame.shape[2] == 4:
+        return np.ascontiguousarray(frame)
+    bgra = np.empty(frame.shape[:2] + (4,), dtype=np.uint8)
+    bgra[..., :3] = frame[..., ::-1]
+    bgra[..., 3] = 255
+    return bgra
+
+
+def load_frames(source, size=224, seed=0):
+    """Load frames as a list of BGRA arrays.
+
+    Sources: a directory of PNGs or of .npz chunks (as written by dbd.recorder), an
+    .npy/.npz stack shaped (N, H, W, C) with uint8 RGB (C=3) or BGRA (C=4) — .npz files
+    use their "frames" array — or `synthetic[:N]` noise.
+    """
+    if source.startswith("synthetic"):
+        count = int(source.partition(":")[2] or 300)
+        rng = np.random.default_rng(seed)
+        return [rng.integers(0, 256, (size, size, 4), dtype=np.uint8) for _ in range(count)]
+    if os.path.isdir(source):
+        chunks = sorted(n for n in os.listdir(source) if n.lower().endswith(".npz"))
+        if chunks:
+            return [frame for name in chunks for frame in load_frames(os.path.join(source, name))]
+        from PIL import Image
+        names = sorted(n for n in os.listdir(source) if n.lower().endswith(".png"))
+        return [to_bgra(np.asarray(Image.open(os.path.join(source, n)).convert("RGB"))) for n in names]
+    if source.endswith(".npz"):
+        with np.load(source) as data:
+            stack = data["frames"] if "frames" in data else data[data.files[0]]
+    elif source.endswith(".npy"):
+        stack = np.load(source)
+    else:
+        raise ValueError(f"Unsupported frame source: {source}")
+    return [to_bgra(frame) for frame in stack]
+
+
+class CaptureBackend:
+    """Base class for capture backends; see the module docstring for the interface."""
+
+    def __init__(self):
+        self.region = None
+
+    def default_region(self):
+        # Region to use when the caller has none; None means "ask the display".
+        return None
+
+    def setup(self, region):
+        self.region = dict(region)
+
+    @property
+    def shape(self):
+        return (self.region["height"], self.region["width"], 4)
+
+    def allocate(self):
+        return np.empty(self.shape, dtype=np.uint8)
+
+    def grab_into(self, out):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MSSCapture(CaptureBackend):
+    """mss screen grabs (Windows GDI, macOS, X11), one mss handle per grabbing thread."""
+
+    def __init__(self):
+        super().__init__()
+        self._local = threading.local()
+
+    def screenshot(self):
+        # Raw mss ScreenShot of the region (for the PIL path in AI_model).
+        sct = getattr(self._local, "mss", None)
+        if sct is None:
+            from mss import mss
+            sct = self._local.mss = mss()
+        return sct.grab(self.region)
+
+    def grab_into(self, out):
+        timestamp = time.perf_counter()
+        shot = self.screenshot()
+        np.copyto(out, np.frombuffer(shot.bgra, dtype=np.uint8).reshape(out.shape))
+        return timestamp
+
+    def close(self):
+        # Releases the calling thread's handle (its GDI device contexts / X display); a
+        # handle belongs to the thread that created it, so the grabbing thread closes it.
+        sct = getattr(self._local, "mss", None)
+        if sct is not None:
+            sct.close()
+            self._local.mss = None
+
+
+class _XImage(ctypes.Structure):
+    # Leading fields of Xlib's XImage; only these are read.
+    _fields_ = [
+        ("width", ctypes.c_int), ("height", ctypes.c_int), ("xoffset", ctypes.c_int), ("format", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+        ("byte_order", ctypes.c_int), ("bitmap_unit", ctypes.c_int), ("bitmap_bit_order", ctypes.c_int),
+        ("bitmap_pad", ctypes.c_int), ("depth", ctypes.c_int), ("bytes_per_line", ctypes.c_int),
+        ("bits_per_pixel", ctypes.c_int),
+    ]
+
+
+class _XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [("shmseg", ctypes.c_ulong), ("shmid", ctypes.c_int), ("shmaddr", ctypes.c_void_p),
+                ("readOnly", ctypes.c_int)]
+
+
+class XShmCapture(CaptureBackend):
+    """X11 MIT-SHM grabs into a persistent shared-memory XImage (Linux).
+
+    The X server writes each grab straight into a SysV shared-memory segment that is
+    created once per region, so a grab is one XShmGetImage round trip plus one copy into
+    the caller's buffer — no per-frame allocation. Requires a 32 bpp TrueColor root window
+    (the usual 24/32-bit depth), whose little-endian pixel layout is BGRX.
+    """
+
+    ZPixmap = 2
+    IPC_PRIVATE = 0
+    IPC_CREAT = 0o1000
+    IPC_RMID = 0
+
+    def __init__(self, display=None):
+        super().__init__()
+        self.display_name = display
+        self._display = None
+        self._image = None
+        self._view = None
+
+    def setup(self, region):
+        self._release_image()
+        super().setup(region)
+
+    def _load(self):
+        def lib(name):
+            path = ctypes.util.find_library(name)
+            if path is None:
+                raise OSError(f"lib{name} not found")
+            return ctypes.CDLL(path, use_errno=True)
+
+        x11, xext, libc = lib("X11"), lib("Xext"), lib("c")
+        x11.XOpenDisplay.restype = ctypes.c_void_p
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XDefaultScreen.argtypes = [ctypes.c_void_p]
+        x11.XRootWindow.restype = ctypes.c_ulong
+        x11.XRootWindow.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDefaultVisual.restype = ctypes.c_void_p
+        x11.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XFree.argtypes = [ctypes.c_void_p]
+        x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+        xext.XShmCreateImage.restype = ctypes.POINTER(_XImage)
+        xext.XShmCreateImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int,
+                                         ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo),
+                                         ctypes.c_uint, ctypes.c_uint]
+        xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+        xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+        xext.XShmGetImage.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(_XImage),
+                                      ctypes.c_int, ctypes.c_int, ctypes.c_ulong]
+        libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        libc.shmat.restype = ctypes.c_void_p
+        libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        libc.shmdt.argtypes = [ctypes.c_void_p]
+        libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+        self._x11, self._xext, self._libc = x11, xext, libc
+
+    def _open(self):
+        self._load()
+        name = self.display_name or os.environ.get("DISPLAY")
+        self._display = self._x11.XOpenDisplay(name.encode() if name else None)
+        if not self._display:
+            raise OSError(f"Cannot open X display {name!r}")
+        if not self._xext.XShmQueryExtension(self._display):
+            self.close()
+            raise OSError("X server has no MIT-SHM extension")
+        self._screen = self._x11.XDefaultScreen(self._display)
+        self._root = self._x11.XRootWindow(self._display, self._screen)
+
+    def _create_image(self):
+        width, height = self.region["width"], self.region["height"]
+        shminfo = _XShmSegmentInfo()
+        image = self._xext.XShmCreateImage(
+            self._display, self._x11.XDefaultVisual(self._display, self._screen),
+            self._x11.XDefaultDepth(self._display, self._screen), self.ZPixmap, None, ctypes.byref(shminfo),
+            width, height)
+        if not image:
+            raise OSError("XShmCreateImage failed")
+        if image.contents.bits_per_pixel != 32:
+            self._x11.XFree(image)
+            raise OSError(f"Unsupported X pixel format: {image.contents.bits_per_pixel} bpp")
+        stride = image.contents.bytes_per_line
+        size = stride * height
+        shmid = self._libc.shmget(self.IPC_PRIVATE, size, self.IPC_CREAT | 0o600)
+        if shmid < 0:
+            self._x11.XFree(image)
+            raise OSError(ctypes.get_errno(), "shmget failed")
+        shmaddr = self._libc.shmat(shmid, None, 0)
+        if shmaddr in (None, ctypes.c_void_p(-1).value):
+            self._libc.shmctl(shmid, self.IPC_RMID, None)
+            self._x11.XFree(image)
+            raise OSError(ctypes.get_errno(), "shmat failed")
+        shminfo.shmid, shminfo.shmaddr, shminfo.readOnly = shmid, shmaddr, 0
+        image.contents.data = shmaddr
+        self._xext.XShmAttach(self._display, ctypes.byref(shminfo))
+        self._x11.XSync(self._display, 0)
+        # Marked for removal now; the segment lives until both sides detach.
+        self._libc.shmctl(shmid, self.IPC_RMID, None)
+        self._image, self._shminfo = image, shminfo
+        rows = np.ctypeslib.as_array((ctypes.c_ubyte * size).from_address(shmaddr)).reshape(height, stride)
+        self._view = rows[:, :width * 4].reshape(height, width, 4)
+
+    def grab_into(self, out):
+        if self._display is None:
+            self._open()
+        if self._image is None:
+            self._create_image()
+        timestamp = time.perf_counter()
+        if not self._xext.XShmGetImage(self._display, self._root, self._image,
+                                       self.region["left"], self.region["top"], ctypes.c_ulong(-1).value):
+            raise OSError("XShmGetImage failed")
+        np.copyto(out, self._view)
+        return timestamp
+
+    @classmethod
+    def available(cls, display=None):
+        # Whether the X server can be reached and supports MIT-SHM.
+        probe = cls(display)
+        try:
+            probe._open()
+        except OSError:
+            return False
+        probe.close()
+        return True
+
+    def _release_image(self):
+        if self._image is not None:
+            self._view = None
+            self._xext.XShmDetach(self._display, ctypes.byref(self._shminfo))
+            self._x11.XSync(self._display, 0)
+            self._libc.shmdt(self._shminfo.shmaddr)
+            self._x11.XFree(self._image)
+            self._image = None
+
+    def close(self):
+        if self._display is not None:
+            self._release_image()
+            self._x11.XCloseDisplay(self._display)
+            self._display = None
+
+
+class FileCapture(CaptureBackend):
+    """Replays frames from disk (any load_frames source) or a list of BGRA arrays.
+
+    Frames are loaded up front, so grabs are a plain copy. Loops by default; with
+    loop=False, grab_into raises EOFError after the last frame.
+    """
+
+    def __init__(self, source, loop=True):
+        super().__init__()
+        self.frames = load_frames(source) if isinstance(source, str) else [to_bgra(f) for f in source]
+        if not self.frames:
+            raise ValueError(f"No frames found in {source}")
+        self.loop = loop
+        self.index = 0
+
+    def default_region(self):
+        height, width = self.frames[0].shape[:2]
+        return {"top": 0, "left": 0, "width": width, "height": height}
+
+    def grab_into(self, out):
+        if self.index >= len(self.frames):
+            if not self.loop:
+                raise EOFError("End of capture frames")
+            self.index = 0
+        timestamp = time.perf_counter()
+        np.copyto(out, self.frames[self.index])
+        self.index += 1
+        return timestamp
+
+
+class SyntheticCapture(CaptureBackend):
+    """Generated frames: `generator(index, out)` fills `out` in place for frame `index`.
+
+    The default generator writes seeded uniform noise, so runs are reproducible.
+    """
+
+    def __init__(self, generator=None, size=224, seed=0):
+        super().__init__()
+        self.size = size
+        self.generator = generator or self._noise
+        self._rng = np.random.default_rng(seed)
+        self.index = 0
+
+    def default_region(self):
+        return {"top": 0, "left": 0, "width": self.size, "height": self.size}
+
+    def _noise(self, index, out):
+        out[...] = self._rng.integers(0, 256, out.shape, dtype=np.uint8)
+
+    def grab_into(self, out):
+        timestamp = time.perf_counter()
+        self.generator(self.index, out)
+        self.index += 1
+        return timestamp
+
+
+def create_capture(name="auto"):
+    """Backend from a config string.
+
+    "auto" (X11 shared memory on Linux with a display, mss elsewhere), "mss", "xshm",
+    "file:<source>" or "synthetic[:size]".
+    """
+    if name == "auto":
+        name = "xshm" if sys.platform.startswith("linux") and XShmCapture.available() else "mss"
+    if name == "mss":
+        return MSSCapture()
+    if name == "xshm":
+        return XShmCapture()
+    if name.startswith("file:"):
+        return FileCapture(name.partition(":")[2])
+    if name.startswith("synthetic"):
+        return SyntheticCapture(size=int(name.partition(":")[2] or 224))
+    raise ValueError(f"Unknown capture backend: {name}")
@@ -0,0 +1,426 @@
+"""Headless Euclid engine: model loading and the capture -> inference -> key dispatch loop.
+
+Plain Python with no Qt dependency. The overlay's MonitorWorker and the separate engine
+process (dbd.engine_process) are thin adapters over Engine; it also runs on its own for
+profiling and soak tests, e.g. on a Linux box without a display:
+
+    python -m dbd.engine --capture synthetic --duration 60 --stats soak.json
+    python -m dbd.engine --capture file:euclid_recordings/ --sync --frames 5000
+
+`settings` dictionaries are euclid_config.json contents; missing keys use the defaults.
+"""
+import os
+import time
+
+import numpy as np
+
+OPTIMIZED_CACHE_DIR = "euclid_cache"  # ORT-optimized model graphs, reused across launches
+STATS_INTERVAL = 0.5  # seconds between live stats updates
+
+# ----- NVML for GPU monitoring (initialized on first use, not at startup) -----
+NVML_AVAILABLE = None
+
+
+def init_nvml():
+    """Initialize NVML once; returns whether it is available."""
+    global NVML_AVAILABLE
+    if NVML_AVAILABLE is None:
+        try:
+            import pynvml
+            pynvml.nvmlInit()
+            NVML_AVAILABLE = True
+        except Exception:
+            NVML_AVAILABLE = False
+    return NVML_AVAILABLE
+
+
+def load_model(settings, base_path, log=print):
+    """Find, tune and build the AI_model (GPU first, CPU fallback) and warm it up.
+
+    Returns (ai_model, provider), or (None, None) when model.onnx is missing.
+    """
+    from dbd.AI_model import AI_model
+
+    onnx_model = os.path.join(base_path, "model.onnx")
+    if not os.path.exists(onnx_model):
+        log("❌ model.onnx not found!")
+        return None, None
+
+    variant = settings.get("model_variant", "auto")
+    tolerance = settings.get("variant_tolerance", 0.01)
+    capture = settings.get("capture_backend", "auto")
+    regions = None
+    if settings.get("capture_regions"):
+        from dbd.AI_model import resolve_regions
+        regions = resolve_regions(settings["capture_regions"])
+    cascade = settings.get("cascade", {})
+    cascade_args = {}
+    if cascade.get("enabled", False) and regions is not None and len(regions) > 1:
+        log("The cascade gate only applies to a single capture region; running the full model.")
+    elif cascade.get("enabled", False):
+        gate_model = os.path.join(base_path, cascade.get("model", "model.gate.onnx"))
+        if os.path.exists(gate_model):
+            cascade_args = {"cascade_model": gate_model, "cascade_threshold": cascade.get("threshold", 0.2),
+                            "cascade_refresh": cascade.get("refresh_every", 15)}
+        else:
+            log(f"Cascade gate {os.path.basename(gate_model)} not found; running the full model on every frame.")
+
+    session_config = None
+    if settings.get("autotune", True):
+        try:
+            from dbd.autotune import autotune
+            session_config = autotune(onnx_model, variant=variant, variant_tolerance=tolerance, log=log)
+        except Exception as e:
+            log(f"Autotune failed: {e}. Using default session settings.")
+
+    use_gpu = True
+    nb_cpu_threads = 4
+    try:
+        ai_model = AI_model(onnx_model, use_gpu, nb_cpu_threads, variant=variant, variant_tolerance=tolerance,
+                            session_config=session_config, optimized_cache_dir=OPTIMIZED_CACHE_DIR,
+                            capture=capture, regions=regions, **cascade_args)
+        provider = ai_model.check_provider()
+    except Exception as e:
+        log(f"GPU mode failed: {e}. Falling back to CPU.")
+        use_gpu = False
+        nb_cpu_threads = 2
+        ai_model = AI_model(onnx_model, use_gpu, nb_cpu_threads, variant=variant, variant_tolerance=tolerance,
+                            optimized_cache_dir=OPTIMIZED_CACHE_DIR, capture=capture, regions=regions, **cascade_args)
+        provider = ai_model.check_provider()
+
+    if ai_model.batch_size > 1:
+        mode = "one batched run" if ai_model.batched else "one run per region (fixed model batch size)"
+        log(f"Watching {ai_model.batch_size} capture regions, {mode}.")
+    ai_model.warmup()
+    return ai_model, provider
+
+
+class EngineConfig:
+    """Explicit engine settings (the monitoring part of euclid_config.json)."""
+
+    def __init__(self, fps_limit=60, idle_fps=20, idle_after=2.0, cooldown_safe=1.5, cooldown_risky=1.0,
+                 space_key=32, risk_mode=0, change_gate=None, latency_compensation=None, resource_sampling=None,
+                 recorder=None, stats_export="", stats_interval=STATS_INTERVAL):
+        self.fps_limit = fps_limit
+        self.idle_fps = idle_fps
+        self.idle_after = idle_after
+        self.cooldown_safe = cooldown_safe
+        self.cooldown_risky = cooldown_risky
+        self.space_key = space_key
+        self.risk_mode = risk_mode  # 1 = Safe, 0 = Risky
+        self.change_gate = change_gate or {}
+        self.latency_compensation = latency_compensation or {}
+        self.resource_sampling = resource_sampling if resource_sampling is not None else {"enabled": True}
+        self.recorder = recorder or {}
+        self.stats_export = stats_export
+        self.stats_interval = stats_interval
+
+    @classmethod
+    def from_settings(cls, settings):
+        # Build from a config dict; unknown keys (keybinds, model options...) are ignored.
+        defaults = cls()
+        keys = ("fps_limit", "idle_fps", "idle_after", "cooldown_safe", "cooldown_risky", "space_key", "risk_mode",
+                "change_gate", "latency_compensation", "resource_sampling", "recorder", "stats_export")
+        return cls(**{key: settings.get(key, getattr(defaults, key)) for key in keys})
+
+
+class Engine:
+    """Capture -> inference -> key dispatch, without any GUI.
+
+    `ai_model` supplies the frames through its capture backend (pass `capture` to swap in
+    another CaptureBackend, e.g. a FileCapture for deterministic runs); `press`/`release`
+    are the key sink, called with the configured key code (DirectInput by default).
+
+    start() launches the capture thread and step() handles the newest frame, so a caller
+    can drive the loop itself; run() does both until stopped. With threaded=False there is
+    no capture thread or pacing: every step() grabs, preprocesses and decides inline,
+    which makes runs reproducible for profiling. risk_mode may be changed at any time.
+
+    When the model watches several capture regions, each step decides every region
+    separately (RegionTriggers) from one batched inference; `last_predictions` holds the
+    per-region results and step() returns the one that decided the frame.
+    """
+
+    def __init__(self, ai_model, config=None, provider=None, capture=None, press=None, release=None,
+                 log=print, on_stats=None):
+        self.ai_model = ai_model
+        self.config = config or EngineConfig()
+        self.provider = provider or ai_model.check_provider()
+        if capture is not None:
+            ai_model.set_capture(capture)
+        self.press = press
+        self.release = release
+        self.log = log
+        self.on_stats = on_stats
+        self.risk_mode = self.config.risk_mode
+        self.running = False
+        self.stats = None
+        self.last_prediction = None
+        self.last_predictions = None
+        self._threaded = True
+
+    def start(self, threaded=True):
+        from dbd.pipeline import FrameRing, FrameChangeGate, CaptureStage, HitTrigger, RegionTriggers
+        from dbd.perf_stats import PerfStats, ResourceSampler
+        from dbd.scheduler import FrameScheduler
+
+        config, ai_model = self.config, self.ai_model
+        if self.press is None or self.release is None:
+            from dbd.utils.directkeys import PressKey, ReleaseKey
+            self.press, self.release = self.press or PressKey, self.release or ReleaseKey
+
+        self.recorder = None
+        if config.recorder.get("enabled", False):
+            from dbd.recorder import FrameRecorder
+            self.recorder = FrameRecorder(config.recorder.get("directory", "euclid_recordings"),
+                                          len(ai_model.DESCRIPTIONS), config.recorder.get("capacity", 256),
+                                          config.recorder.get("before", 30), config.recorder.get("after", 30))
+
+        regions = ai_model.batch_size
+        triggers = []
+        for _ in range(regions):
+            if config.latency_compensation.get("enabled", False):
+                from dbd.hit_timing import PredictiveHitTrigger
+                triggers.append(PredictiveHitTrigger(self.press, self.release, config.space_key, ai_model.HIT_MASK,
+                                                     on_press=self._on_timed_press))
+            else:
+                triggers.append(HitTrigger(self.press, self.release, config.space_key))
+        self.trigger = triggers[0] if regions == 1 else RegionTriggers(triggers)
+
+        self.stats = PerfStats(1.0 / config.fps_limit, self.provider)
+        self.gate = None
+        if config.change_gate.get("enabled", False) and regions > 1:
+            self.log("The change gate only applies to a single capture region; evaluating every frame.")
+        elif config.change_gate.get("enabled", False):
+            self.gate = FrameChangeGate(config.change_gate.get("pixel_threshold", 16),
+                                        config.change_gate.get("min_pixels", 4), config.change_gate.get("max_reuse", 30))
+        self._threaded = threaded
+        self.capture = None
+        if threaded:
+            # Capture runs on its own thread and always hands over the newest frame;
+            # step() only does inference and key dispatch.
+            pixels_shape = None
+            if self.recorder is not None:
+                pixels_shape = (ai_model.INPUT_SIZE, ai_model.INPUT_SIZE, 4)
+                if regions > 1:
+                    pixels_shape = (regions,) + pixels_shape
+            self.ring = FrameRing(ai_model.input_buffer.shape, pixels_shape=pixels_shape)
+            self.scheduler = FrameScheduler(config.fps_limit, config.idle_fps, config.idle_after)
+            self.capture = CaptureStage(ai_model, self.ring, self.scheduler, stats=self.stats, gate=self.gate)
+            self.capture.start()
+        else:
+            self.ring = None
+            self.scheduler = None
+            if regions > 1:
+                self._frames = ai_model.allocate_regions()
+                self._pixels = np.empty((regions, ai_model.INPUT_SIZE, ai_model.INPUT_SIZE, 4), dtype=np.uint8)
+            else:
+                self._frame = ai_model.capture.allocate()
+
+        self.sampler = None
+        if config.resource_sampling.get("enabled", True):
+            self.sampler = ResourceSampler(self.stats, config.resource_sampling.get("interval", 1.0),
+                                           config.resource_sampling.get("capacity", 600), use_nvml=init_nvml())
+            self.stats.resources = self.sampler
+            self.sampler.start()
+        self._next_status = time.perf_counter() + config.stats_interval
+        self.last_prediction = None
+        self.last_predictions = None
+        self.running = True
+
+    def _on_timed_press(self):
+        if self.recorder is not None:
+            self.recorder.press_pending = True
+        self.log("🎯 Euclid triggered action! (timed)")
+
+    def _next_frame(self, timeout):
+        # (input tensor, BGRA pixels or None, capture time, changed) of the next frame, or None.
+        ai_model = self.ai_model
+        if not self._threaded and ai_model.batch_size > 1:
+            frames, captured_at = ai_model.grab_regions(self._frames)
+            grabbed_at = time.perf_counter()
+            image = ai_model.preprocess_regions(frames, pixels=self._pixels)
+            self.stats.record("capture", grabbed_at - captured_at)
+            self.stats.record("preprocess", time.perf_counter() - grabbed_at)
+            return image, self._pixels, captured_at, True
+        if not self._threaded:
+            frame, captured_at = ai_model.grab(self._frame)
+            grabbed_at = time.perf_counter()
+            changed = self.gate is None or self.gate.changed(frame)
+            pixels = ai_model.resample(frame)
+            image = ai_model.normalize(pixels) if changed else None
+            self.stats.record("capture", grabbed_at - captured_at)
+            self.stats.record("preprocess", time.perf_counter() - grabbed_at)
+            return image, pixels, captured_at, changed
+        index = self.ring.acquire_read(timeout=timeout)
+        if index is None:
+            if self.capture.error is not None:
+                raise self.capture.error
+            return None
+        pixels = self.ring.pixels[index] if self.ring.pixels is not None else None
+        return self.ring.buffers[index], pixels, self.ring.timestamps[index], self.ring.changed[index]
+
+    def step(self, timeout=0.5):
+        """Handle the newest frame; returns its Prediction, or None if no frame arrived in time."""
+        next_frame = self._next_frame(timeout)
+        if next_frame is None:
+            return None
+        image, pixels, captured_at, changed = next_frame
+        stats, config = self.stats, self.config
+        picked_at = time.perf_counter()
+
+        # Unchanged frames (change gate) were not preprocessed; reuse the last prediction.
+        evaluated = changed or self.last_prediction is None
+        regions = self.ai_model.batch_size > 1
+        if evaluated and regions:
+            self.last_predictions = self.ai_model.predict_regions(image)
+        elif evaluated:
+            if image is None:
+                image = self.ai_model.normalize(pixels)
+            self.last_prediction = self.ai_model.predict(image)
+        if regions:
+            # The region that decides this frame: the first hit, else the first non-"None" class.
+            predictions = self.last_predictions
+            index = next((i for i, p in enumerate(predictions) if p.hit),
+                         next((i for i, p in enumerate(predictions) if p.pred != 0), 0))
+            self.last_prediction = predictions[index]
+            if pixels is not None:
+                pixels = pixels[index]
+        prediction = self.last_prediction
+        if not evaluated:
+            # Not run through the model: the trigger and recorder must not take it as new output.
+            prediction = prediction.as_gated()
+        current_time = time.perf_counter()
+        if self.scheduler is not None:
+            self.scheduler.observe(prediction.pred != 0, current_time)
+        # Determine cooldown based on mode: if SAFE (risk mode 1) use cooldown_safe; else (RISKY) use cooldown_risky
+        safe = self.risk_mode == 1
+        cooldown = config.cooldown_safe if safe else config.cooldown_risky
+        offset = config.latency_compensation.get("offset_safe" if safe else "offset_risky", 0.0)
+        pressed = self.trigger.update(self.last_predictions if regions else prediction, cooldown, current_time,
+                                      captured_at, offset)
+        if pressed:
+            self.log("🎯 Euclid triggered action!")
+        decided_at = time.perf_counter()
+        if self.recorder is not None:
+            self.recorder.record(pixels, prediction, captured_at, decided_at, pressed)
+
+        stats.record("wait", picked_at - captured_at)
+        if evaluated:
+            stats.record("inference", current_time - picked_at)
+        stats.record("dispatch", decided_at - current_time)
+        stats.frame_done(decided_at - captured_at)
+        if decided_at >= self._next_status:
+            self._update_counters()
+            if self.on_stats is not None:
+                self.on_stats(stats.status_line())
+            self._next_status = decided_at + config.stats_interval
+        return prediction
+
+    def _update_counters(self):
+        self.stats.dropped_frames = self.ring.dropped if self.ring is not None else 0
+        self.stats.skipped_frames = self.gate.skipped if self.gate is not None else 0
+        cascade = self.ai_model.cascade
+        self.stats.cascade_skipped = cascade.skipped if cascade is not None else 0
+
+    def stop(self):
+        """Stop the capture/sampler threads, flush the recorder and export stats; returns the PerfStats."""
+        if not self.running:
+            return self.stats
+        self.running = False
+        if self.capture is not None:
+            self.capture.stop()
+            self.capture.join(1.0)
+        else:
+            self.ai_model.close_capture()
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.sampler.join(1.0)
+        self.trigger.close()
+        if self.recorder is not None:
+            self.recorder.close()
+            self.log(f"💾 Recorded {self.recorder.chunks} clip(s) to {self.recorder.directory}")
+        self._update_counters()
+        if self.config.stats_export:
+            try:
+                self.stats.export(self.config.stats_export)
+            except Exception as e:
+                self.log(f"Stats export failed: {e}")
+        return self.stats
+
+    def get_stats(self):
+        # Session stats as a dict (see PerfStats.to_dict), or None before start().
+        if self.stats is None:
+            return None
+        if self.running:
+            self._update_counters()
+        return self.stats.to_dict()
+
+    def run(self, should_run=lambda: True, threaded=True, max_frames=None):
+        """start(), step() until should_run() is False, stop() or max_frames; returns the PerfStats."""
+        self.start(threaded)
+        try:
+            while self.running and should_run():
+                self.step()
+                if max_frames is not None and self.stats.frames >= max_frames:
+                    break
+        finally:
+            self.stop()
+        return self.stats
+
+
+def main(argv=None):
+    import argparse
+    import json
+    from collections import Counter
+
+    parser = argparse.ArgumentParser(description="Run the Euclid engine without the overlay.")
+    parser.add_argument("--config", default="euclid_config.json", help="Config file (defaults for missing keys)")
+    parser.add_argument("--model-dir", default=".", help="Directory containing model.onnx")
+    parser.add_argument("--capture", help='Capture backend override, e.g. "synthetic", "file:frames/", "xshm"')
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run (0 = until Ctrl+C)")
+    parser.add_argument("--frames", type=int, default=None, help="Stop after this many frames")
+    parser.add_argument("--sync", action="store_true", help="No capture thread or pacing: grab, infer and decide inline")
+    parser.add_argument("--keys", choices=("count", "send"), default="count",
+                        help='"count" only counts presses; "send" sends real key presses')
+    parser.add_argument("--risk", choices=("safe", "risky"), default=None)
+    parser.add_argument("--stats", help="Write session stats to this .json/.csv file")
+    args = parser.parse_args(argv)
+
+    settings = {}
+    if os.path.exists(args.config):
+        with open(args.config) as f:
+            settings = json.load(f)
+    if args.capture:
+        settings["capture_backend"] = args.capture
+    if args.stats:
+        settings["stats_export"] = args.stats
+    config = EngineConfig.from_settings(settings)
+    if args.risk:
+        config.risk_mode = 1 if args.risk == "safe" else 0
+
+    ai_model, provider = load_model(settings, args.model_dir)
+    if ai_model is None:
+        return 1
+    presses = Counter()
+    press = release = None
+    if args.keys == "count":
+        press, release = (lambda key: presses.update(["press"])), (lambda key: None)
+    engine = Engine(ai_model, config, provider, press=press, release=release,
+                    log=lambda message: None, on_stats=print)
+    deadline = time.perf_counter() + args.duration if args.duration > 0 else None
+    try:
+        engine.run(lambda: deadline is None or time.perf_counter() < deadline, threaded=not args.sync,
+                   max_frames=args.frames)
+    except KeyboardInterrupt:
+        engine.stop()
+    data = engine.get_stats()
+    print(f"Frames: {data['frames']}  FPS: {data['achieved_fps']}  late: {data['late_frames']}  "
+          f"dropped: {data['dropped_frames']}  e2e p99: {data['stages']['e2e']['p99_ms']} ms  "
+          f"presses: {presses['press'] if args.keys == 'count' else 'sent'}")
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
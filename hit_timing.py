@@ -0,0 +1,225 @@
+import threading
+import time
+
+import numpy as np
+
+from dbd.pipeline import HitTrigger
+from dbd.scheduler import SPIN_MARGIN, spin_until
+
+
+class HitTimer(threading.Thread):
+    """Dedicated thread that runs one pending callback at a precise perf_counter time.
+
+    Scheduling again replaces the pending callback; cancel() drops it. The wait is a
+    condition-variable sleep until shortly before the deadline followed by a spin, so a
+    reschedule that arrives mid-wait is picked up immediately.
+    """
+
+    def __init__(self, spin_margin=SPIN_MARGIN):
+        super().__init__(name="EuclidHitTimer", daemon=True)
+        self.spin_margin = spin_margin
+        self._cond = threading.Condition()
+        self._deadline = None
+        self._callback = None
+        self._generation = 0
+        self._running = True
+
+    @property
+    def deadline(self):
+        return self._deadline
+
+    def schedule(self, deadline, callback):
+        with self._cond:
+            self._deadline = deadline
+            self._callback = callback
+            self._generation += 1
+            self._cond.notify()
+
+    def cancel(self):
+        with self._cond:
+            if self._deadline is not None:
+                self._deadline = None
+                self._callback = None
+                self._generation += 1
+                self._cond.notify()
+
+    def run(self):
+        while True:
+            with self._cond:
+                while self._running and self._deadline is None:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                remaining = self._deadline - time.perf_counter() - self.spin_margin
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+                deadline, generation = self._deadline, self._generation
+            spin_until(deadline)
+            with self._cond:
+                if generation != self._generation:
+                    continue  # rescheduled or cancelled while spinning
+                callback = self._callback
+                self._deadline = None
+                self._callback = None
+            callback()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+
+class HitPredictor:
+    """Short history of per-frame logits used to extrapolate when the hit window opens.
+
+    The hit probability of a frame is the softmax mass on the hit classes. While it is
+    rising but still below `threshold`, a least-squares line over the last `fit_frames`
+    frames gives the capture time at which it will cross. Also tracks an EWMA of the
+    capture-to-decision latency and the capture interval. Gated frames (no model output)
+    only count towards the capture interval.
+    """
+
+    def __init__(self, hit_mask, history=8, fit_frames=4, threshold=0.5, smoothing=0.1):
+        self.hit_mask = np.asarray(hit_mask, dtype=bool)
+        self.fit_frames = fit_frames
+        self.threshold = threshold
+        self.smoothing = smoothing
+        self.logits = np.zeros((history, len(self.hit_mask)), dtype=np.float32)
+        self.timestamps = np.zeros(history, dtype=np.float64)
+        self.count = 0
+        self.latency = None
+        self.interval = None
+        self._last_captured = None
+
+    def reset(self):
+        self.count = 0
+        self._last_captured = None
+
+    def observe(self, prediction, captured_at, decided_at):
+        if self._last_captured is not None:
+            self.interval = self._ewma(self.interval, captured_at - self._last_captured)
+        self._last_captured = captured_at
+        if prediction.gated:
+            return
+        slot = self.count % len(self.timestamps)
+        self.logits[slot] = prediction.logits
+        self.timestamps[slot] = captured_at
+        self.count += 1
+        self.latency = self._ewma(self.latency, decided_at - captured_at)
+
+    def _ewma(self, current, sample):
+        return sample if current is None else current + self.smoothing * (sample - current)
+
+    def hit_probabilities(self, frames):
+        # Capture times and hit probabilities of the last `frames` frames, oldest first.
+        size = len(self.timestamps)
+        order = [(self.count - frames + i) % size for i in range(frames)]
+        logits = self.logits[order]
+        exp_x = np.exp(logits - logits.max(axis=1, keepdims=True))
+        probs = exp_x / exp_x.sum(axis=1, keepdims=True)
+        return self.timestamps[order], probs[:, self.hit_mask].sum(axis=1)
+
+    def estimate_open(self):
+        # Predicted capture-clock time at which the hit probability crosses `threshold`,
+        # or None when there is no rising trend to extrapolate.
+        frames = min(self.count, self.fit_frames, len(self.timestamps))
+        if frames < 2:
+            return None
+        times, p_hit = self.hit_probabilities(frames)
+        if p_hit[-1] >= self.threshold:
+            return times[-1]
+        t = times - times[-1]
+        t_mean, p_mean = t.mean(), p_hit.mean()
+        variance = ((t - t_mean) ** 2).sum()
+        if variance <= 0:
+            return None
+        slope = ((t - t_mean) * (p_hit - p_mean)).sum() / variance
+        if slope <= 0:
+            return None
+        intercept = p_mean - slope * t_mean
+        return times[-1] + (self.threshold - intercept) / slope
+
+
+class PredictiveHitTrigger(HitTrigger):
+    """HitTrigger that times the key press from the recent hit-probability trend.
+
+    Instead of pressing on the first frame classified as a hit (one capture + inference +
+    input latency after the visual moment), it extrapolates when the hit window opens and
+    has a HitTimer press at that time plus `offset`. A press is only scheduled when it
+    would fire before the next frame's decision could (next capture + measured pipeline
+    latency); otherwise the next frame refines the estimate. A frame that is already a
+    hit presses immediately unless a timed press is due sooner than that; one classified
+    as a non-hit class (out, frontier, ...) cancels any pending press, so compensation
+    only changes when a press happens, not which frames press. A gated frame leaves the
+    history and any pending press alone. Cooldowns are checked both when scheduling and
+    when the timer fires.
+    """
+
+    def __init__(self, press, release, key, hit_mask, on_press=None):
+        super().__init__(press, release, key)
+        self.predictor = HitPredictor(hit_mask)
+        self.timer = HitTimer()
+        self.on_press = on_press
+        self.timed_presses = 0
+        self._lock = threading.Lock()
+        self._cooldown = 0.0
+        self.timer.start()
+
+    def _ready(self, now, cooldown):
+        return self.last_hit_time is None or now - self.last_hit_time >= cooldown
+
+    def _press(self, now):
+        self.press(self.key)
+        self.release(self.key)
+        self.last_hit_time = now
+
+    def _fire(self):
+        with self._lock:
+            now = time.perf_counter()
+            if not self._ready(now, self._cooldown):
+                return
+            self._press(now)
+            self.timed_presses += 1
+        if self.on_press is not None:
+            self.on_press()
+
+    def update(self, prediction, cooldown, now, captured_at=None, offset=0.0):
+        captured_at = now if captured_at is None else captured_at
+        predictor = self.predictor
+        predictor.observe(prediction, captured_at, now)
+        with self._lock:
+            if not self._ready(now, cooldown):
+                self.timer.cancel()
+                return False
+            self._cooldown = cooldown
+            # Time by which the next frame would be decided; anything due earlier must be scheduled now.
+            next_decision = captured_at + (predictor.interval or 0.0) + (predictor.latency or 0.0)
+            pending = self.timer.deadline
+
+            if prediction.hit:
+                if pending is not None and pending <= next_decision:
+                    return False
+                self.timer.cancel()
+                self._press(now)
+                return True
+            if prediction.gated:
+                # Nothing new to extrapolate from: keep any pending press as scheduled.
+                return False
+
+            # Only extrapolate from "None" frames: a frame classified as a non-hit class
+            # (out, frontier, ...) never presses, as with HitTrigger, whatever its hit mass.
+            opens_at = predictor.estimate_open() if prediction.pred == 0 else None
+            if opens_at is None:
+                self.timer.cancel()
+                return False
+            fire_at = opens_at + offset
+            if fire_at <= next_decision:
+                self.timer.schedule(max(fire_at, now), self._fire)
+            else:
+                self.timer.cancel()
+            return False
+
+    def close(self):
+        self.timer.cancel()
+        self.timer.stop()
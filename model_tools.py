@@ -0,0 +1,216 @@
+"""Model tooling: INT8 / FP16 variants, accuracy validation against FP32 and cascade gate evaluation.
+
+    python -m dbd.model_tools int8 model.onnx frames/       # static INT8, calibrated on recorded frames
+    python -m dbd.model_tools fp16 model.onnx               # FP16 weights, float32 inputs/outputs
+    python -m dbd.model_tools validate model.onnx frames/   # per-class drift + latency, writes the manifest
+    python -m dbd.model_tools gate model.onnx model.gate.onnx euclid_recordings/   # cascade gate misses
+
+Variants are written next to the FP32 model (model.int8.onnx, model.fp16.onnx). `validate`
+records agreement with the FP32 predictions and latency for the provider it ran on in
+model.variants.json, which AI_model reads to pick a variant at load time. Run it once per
+provider (add --gpu) to record GPU timings too. `gate` scores a cascade pre-filter model
+against the full classifier: how many frames it would skip and how many target frames it
+would miss, per threshold. Frame sources are those of dbd.capture.load_frames.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+from dbd.AI_model import AI_model, CascadeGate, OFFLINE_REGION, variant_path, variant_manifest_path
+from dbd.capture import load_frames
+
+VARIANTS = ("int8", "fp16")
+
+
+def load_model(onnx_filepath, use_gpu=False, threads=None):
+    return AI_model(onnx_filepath, use_gpu, threads, monitor=OFFLINE_REGION)
+
+
+def preprocess_frames(ai_model, frames):
+    # Model-ready (1, 3, 224, 224) inputs, one copy per frame.
+    return [ai_model.preprocess(frame).copy() for frame in frames]
+
+
+def quantize_int8(onnx_filepath, frames, output=None):
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    output = output or variant_path(onnx_filepath, "int8")
+    reference = load_model(onnx_filepath)
+    inputs = preprocess_frames(reference, frames)
+    input_name = reference.input_name
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self._iter = iter(inputs)
+
+        def get_next(self):
+            image = next(self._iter, None)
+            return None if image is None else {input_name: image}
+
+    prepared = output + ".prep.onnx"
+    # ONNX shape inference is enough for a fixed 224x224 CNN; skips the sympy dependency.
+    quant_pre_process(onnx_filepath, prepared, skip_symbolic_shape=True)
+    try:
+        quantize_static(prepared, output, FrameReader(), quant_format=QuantFormat.QDQ, per_channel=True,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    finally:
+        os.remove(prepared)
+    return output
+
+
+def convert_fp16(onnx_filepath, output=None):
+    import onnx
+    try:
+        from onnxconverter_common.float16 import convert_float_to_float16
+    except ImportError:
+        from onnxruntime.transformers.float16 import convert_float_to_float16
+
+    output = output or variant_path(onnx_filepath, "fp16")
+    # Keep float32 inputs/outputs so preprocessing and IOBinding buffers stay unchanged.
+    model = convert_float_to_float16(onnx.load(onnx_filepath), keep_io_types=True)
+    onnx.save(model, output)
+    return output
+
+
+def measure(ai_model, inputs, warmup=5):
+    # Predicted classes, logits and median latency (ms) of a model over the inputs.
+    for image in inputs[:warmup]:
+        ai_model.predict(image)
+    preds, logits, timings = [], [], []
+    for image in inputs:
+        start = time.perf_counter()
+        prediction = ai_model.predict(image)
+        timings.append(time.perf_counter() - start)
+        preds.append(prediction.pred)
+        logits.append(prediction.logits)
+    return np.array(preds), np.array(logits), float(np.median(timings) * 1000)
+
+
+def validate(onnx_filepath, frames, use_gpu=False, threads=None):
+    """Compare each available variant with FP32 and update the variants manifest."""
+    reference = load_model(onnx_filepath, use_gpu, threads)
+    inputs = preprocess_frames(reference, frames)
+    manifest_file = variant_manifest_path(onnx_filepath)
+    manifest = {"variants": {}, "fp32_latency_ms": {}}
+    if os.path.exists(manifest_file):
+        with open(manifest_file) as f:
+            manifest = json.load(f)
+
+    provider = reference.check_provider()
+    ref_preds, ref_logits, ref_latency = measure(reference, inputs)
+    manifest["fp32_latency_ms"][provider] = round(ref_latency, 3)
+    ref_counts = Counter(ref_preds.tolist())
+    print(f"Provider: {provider}  frames: {len(inputs)}  fp32: {ref_latency:.3f} ms")
+
+    for name in VARIANTS:
+        path = variant_path(onnx_filepath, name)
+        if not os.path.exists(path):
+            continue
+        model = load_model(path, use_gpu, threads)
+        preds, logits, latency = measure(model, inputs)
+        agree = preds == ref_preds
+        per_class = {}
+        for cls, total in sorted(ref_counts.items()):
+            mask = ref_preds == cls
+            per_class[AI_model.DESCRIPTIONS[cls]] = {"frames": total, "agreement": round(float(agree[mask].mean()), 4)}
+        entry = manifest["variants"].setdefault(name, {"latency_ms": {}})
+        entry.update({
+            "file": os.path.basename(path),
+            "agreement": round(float(agree.mean()), 4),
+            "max_logit_diff": round(float(np.abs(logits - ref_logits).max()), 4),
+            "per_class": per_class,
+        })
+        entry["latency_ms"][model.check_provider()] = round(latency, 3)
+
+        print(f"\n{name}: agreement {entry['agreement']:.2%}  latency {latency:.3f} ms  "
+              f"max logit diff {entry['max_logit_diff']}")
+        for desc, result in per_class.items():
+            print(f"  {desc:<30}{result['frames']:>8}  {result['agreement']:.2%}")
+
+    with open(manifest_file, "w") as f:
+        json.dump(manifest, f, indent=4)
+    return manifest
+
+
+def evaluate_gate(onnx_filepath, gate_filepath, frames, thresholds=(0.05, 0.1, 0.2, 0.3, 0.5), threads=None):
+    """False-negative and skip rates of a cascade gate, using the full model's predictions as labels.
+
+    A false negative is a frame the full model classifies as anything but None that the
+    gate would have rejected (ignoring the periodic refresh, so this is the worst case).
+    """
+    reference = load_model(onnx_filepath, threads=threads)
+    gate = CascadeGate(gate_filepath, threshold=0.0, nb_threads=threads)
+    inputs = preprocess_frames(reference, frames)
+    preds, _, full_latency = measure(reference, inputs)
+    scores, timings = [], []
+    for image in inputs:
+        start = time.perf_counter()
+        scores.append(gate.score(image))
+        timings.append(time.perf_counter() - start)
+    scores = np.array(scores)
+    gate_latency = float(np.median(timings) * 1000)
+    targets = preds != 0
+
+    print(f"Frames: {len(inputs)}  with target: {int(targets.sum())}  "
+          f"full model: {full_latency:.3f} ms  gate: {gate_latency:.3f} ms")
+    print(f"{'threshold':>10}{'skipped':>10}{'missed':>10}{'FN rate':>10}{'est. ms/frame':>15}")
+    report = {"frames": len(inputs), "targets": int(targets.sum()), "full_latency_ms": round(full_latency, 3),
+              "gate_latency_ms": round(gate_latency, 3), "thresholds": {}}
+    for threshold in thresholds:
+        rejected = scores < threshold
+        missed = rejected & targets
+        fn_rate = float(missed.sum() / targets.sum()) if targets.any() else 0.0
+        # Average cost per frame if every rejected frame skipped the full model.
+        cost = gate_latency + full_latency * (1.0 - rejected.mean())
+        per_class = {AI_model.DESCRIPTIONS[cls]: int(count) for cls, count in Counter(preds[missed].tolist()).items()}
+        report["thresholds"][str(threshold)] = {"skip_rate": round(float(rejected.mean()), 4), "missed": int(missed.sum()),
+                                                "fn_rate": round(fn_rate, 4), "missed_per_class": per_class,
+                                                "est_ms_per_frame": round(cost, 3)}
+        print(f"{threshold:>10}{rejected.mean():>10.1%}{int(missed.sum()):>10}{fn_rate:>10.2%}{cost:>15.3f}")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and validate variants of the Euclid model and cascade gates.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    int8 = sub.add_parser("int8", help="Static INT8 quantization calibrated on recorded frames")
+    int8.add_argument("model")
+    int8.add_argument("frames", help="PNG directory, .npy/.npz stack, or synthetic[:N]")
+    fp16 = sub.add_parser("fp16", help="FP16 conversion")
+    fp16.add_argument("model")
+    check = sub.add_parser("validate", help="Per-class drift and latency of each variant vs FP32")
+    check.add_argument("model")
+    check.add_argument("frames", help="PNG directory, .npy/.npz stack, or synthetic[:N]")
+    check.add_argument("--gpu", action="store_true", help="Validate on the GPU provider")
+    check.add_argument("--threads", type=int, default=None)
+    gate = sub.add_parser("gate", help="False-negative rate of a cascade gate model on recorded frames")
+    gate.add_argument("model")
+    gate.add_argument("gate_model")
+    gate.add_argument("frames", help="PNG directory, recorder clips, .npy/.npz stack, or synthetic[:N]")
+    gate.add_argument("--thresholds", type=float, nargs="+", default=[0.05, 0.1, 0.2, 0.3, 0.5])
+    gate.add_argument("--threads", type=int, default=None)
+    gate.add_argument("--json", help="Also write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    if args.command == "int8":
+        print("Wrote", quantize_int8(args.model, load_frames(args.frames)))
+    elif args.command == "fp16":
+        print("Wrote", convert_fp16(args.model))
+    elif args.command == "gate":
+        report = evaluate_gate(args.model, args.gate_model, load_frames(args.frames), args.thresholds, args.threads)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=4)
+    else:
+        validate(args.model, load_frames(args.frames), args.gpu, args.threads)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
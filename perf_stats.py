@@ -0,0 +1,290 @@
+import csv
+import json
+import threading
+import time
+
+
+class LatencyHistogram:
+    """Fixed-bucket log-linear latency histogram (HDR-style).
+
+    Values are bucketed in microseconds: exact below 64 µs, then 32 sub-buckets per
+    power of two (~3% resolution) up to MAX_US. Recording is a handful of integer ops
+    and never allocates, so it is cheap enough to call several times per frame.
+    """
+    SUB_BITS = 6
+    MAX_US = 60_000_000
+
+    def __init__(self):
+        self.counts = [0] * (self._index(self.MAX_US) + 1)
+        self.count = 0
+        self.sum_us = 0
+        self.max_us = 0
+
+    @classmethod
+    def _index(cls, us):
+        linear = 1 << cls.SUB_BITS
+        if us < linear:
+            return us
+        half = linear >> 1
+        exponent = us.bit_length() - cls.SUB_BITS
+        return linear + (exponent - 1) * half + (us >> exponent) - half
+
+    @classmethod
+    def _bucket_midpoint(cls, index):
+        linear = 1 << cls.SUB_BITS
+        if index < linear:
+            return index + 0.5
+        half = linear >> 1
+        exponent, sub = divmod(index - linear, half)
+        exponent += 1
+        return ((sub + half) << exponent) + (1 << exponent) / 2
+
+    def record(self, seconds):
+        us = int(seconds * 1_000_000)
+        if us < 0:
+            us = 0
+        elif us > self.MAX_US:
+            us = self.MAX_US
+        self.counts[self._index(us)] += 1
+        self.count += 1
+        self.sum_us += us
+        if us > self.max_us:
+            self.max_us = us
+
+    def percentile(self, percent):
+        # Value in seconds at the given percentile (0-100), or 0.0 when empty.
+        if self.count == 0:
+            return 0.0
+        target = max(1, int(self.count * percent / 100.0 + 0.5))
+        seen = 0
+        for index, bucket in enumerate(self.counts):
+            seen += bucket
+            if seen >= target:
+                return min(self._bucket_midpoint(index), self.max_us) / 1_000_000
+        return self.max_us / 1_000_000
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.sum_us / self.count / 1000, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50) * 1000, 3),
+            "p90_ms": round(self.percentile(90) * 1000, 3),
+            "p99_ms": round(self.percentile(99) * 1000, 3),
+            "p999_ms": round(self.percentile(99.9) * 1000, 3),
+            "max_ms": round(self.max_us / 1000, 3),
+        }
+
+    def buckets(self):
+        # Non-empty buckets as (midpoint_ms, count) pairs, for plotting.
+        return [(round(self._bucket_midpoint(i) / 1000, 4), c) for i, c in enumerate(self.counts) if c]
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+        self.sum_us = 0
+        self.max_us = 0
+
+
+class PerfStats:
+    """Per-stage latency histograms and frame counters for one monitoring session.
+
+    Stages recorded by the capture thread: capture, preprocess, sleep (actual pacing wait).
+    Stages recorded by the inference thread: wait (frame age when inference picks it up),
+    inference, dispatch and e2e (capture start to hit decision). Each histogram is only
+    written from one thread. All timestamps come from time.perf_counter().
+    """
+    STAGES = ("capture", "preprocess", "sleep", "wait", "inference", "dispatch", "e2e")
+
+    def __init__(self, frame_budget, provider=None):
+        self.frame_budget = frame_budget
+        self.provider = provider
+        self.histograms = {stage: LatencyHistogram() for stage in self.STAGES}
+        self.frames = 0
+        self.late_frames = 0
+        self.dropped_frames = 0
+        self.skipped_frames = 0
+        self.cascade_skipped = 0
+        self.started = time.perf_counter()
+        # Optional ResourceSampler whose samples are exported with the frame timings.
+        self.resources = None
+        # Short window behind the live status line; reset on every status_line() call.
+        self._window_e2e = LatencyHistogram()
+        self._window_started = self.started
+        self._window_frames = 0
+
+    def record(self, stage, seconds):
+        self.histograms[stage].record(seconds)
+
+    def frame_done(self, e2e):
+        # A frame is late when its capture-to-decision latency exceeds one frame period.
+        self.histograms["e2e"].record(e2e)
+        self._window_e2e.record(e2e)
+        self.frames += 1
+        self._window_frames += 1
+        if e2e > self.frame_budget:
+            self.late_frames += 1
+
+    def status_line(self):
+        # Compact overlay text: achieved FPS and p99 end-to-end latency since the last call.
+        now = time.perf_counter()
+        elapsed = now - self._window_started
+        fps = self._window_frames / elapsed if elapsed > 0 else 0.0
+        p99_ms = self._window_e2e.percentile(99) * 1000
+        self._window_e2e.reset()
+        self._window_started = now
+        self._window_frames = 0
+        provider = (self.provider or "?").replace("ExecutionProvider", "")
+        return f"{fps:.0f} FPS · p99 {p99_ms:.1f} ms · {provider}"
+
+    def to_dict(self):
+        duration = time.perf_counter() - self.started
+        return {
+            "provider": self.provider,
+            "duration_s": round(duration, 3),
+            "frames": self.frames,
+            "achieved_fps": round(self.frames / duration, 2) if duration > 0 else 0.0,
+            "late_frames": self.late_frames,
+            "dropped_frames": self.dropped_frames,
+            "skipped_frames": self.skipped_frames,
+            "cascade_skipped": self.cascade_skipped,
+            "stages": {stage: hist.summary() for stage, hist in self.histograms.items()},
+            "buckets": {stage: hist.buckets() for stage, hist in self.histograms.items()},
+            "resources": self.resources.to_dict() if self.resources is not None else None,
+        }
+
+    def export(self, path):
+        # Write the session stats as JSON, or as a per-stage CSV when the path ends in .csv.
+        data = self.to_dict()
+        if path.lower().endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["stage", "count", "mean_ms", "p50_ms", "p90_ms", "p99_ms", "p999_ms", "max_ms"])
+                for stage, summary in data["stages"].items():
+                    writer.writerow([stage] + [summary[k] for k in ("count", "mean_ms", "p50_ms", "p90_ms", "p99_ms", "p999_ms", "max_ms")])
+                writer.writerow([])
+                for key in ("provider", "duration_s", "frames", "achieved_fps", "late_frames", "dropped_frames", "skipped_frames",
+                            "cascade_skipped"):
+                    writer.writerow([key, data[key]])
+                if data["resources"] is not None:
+                    writer.writerow([])
+                    writer.writerow(ResourceSampler.FIELDS)
+                    for sample in data["resources"]["samples"]:
+                        writer.writerow([sample[k] for k in ResourceSampler.FIELDS])
+        else:
+            with open(path, "w") as f:
+                json.dump(data, f, indent=4)
+
+
+class ResourceSampler(threading.Thread):
+    """Background sampler of process CPU and GPU state, kept in a fixed-size ring.
+
+    Every `interval` seconds it records process and system CPU % (psutil) and, when NVML
+    is available, GPU utilization, memory, SM clock and temperature. Each sample also
+    carries the perf_counter time and the PerfStats frame count, so it can be lined up
+    with the frame timings (achieved FPS between samples). Sampling cost is measured; if
+    one sample takes more than `max_overhead` of the interval, the interval is doubled,
+    so the sampler never competes with the inference thread. Missing libraries or
+    failing queries just leave their fields as None.
+    """
+    FIELDS = ("time_s", "frames", "fps", "cpu_process", "cpu_system",
+              "gpu_util", "gpu_mem_mb", "gpu_sm_clock_mhz", "gpu_temp_c")
+
+    def __init__(self, stats=None, interval=1.0, capacity=600, use_nvml=True, gpu_index=0, max_overhead=0.01):
+        super().__init__(name="EuclidResourceSampler", daemon=True)
+        self.stats = stats
+        self.interval = max(interval, 0.05)
+        self.capacity = capacity
+        self.use_nvml = use_nvml
+        self.gpu_index = gpu_index
+        self.max_overhead = max_overhead
+        self.samples = [None] * capacity
+        self.count = 0
+        self.sample_time = 0.0  # total seconds spent sampling
+        self._stop_event = threading.Event()
+        self._process = None
+        self._psutil = None
+        self._nvml = None
+        self._gpu = None
+
+    def _open(self):
+        try:
+            import psutil
+            self._psutil = psutil
+            self._process = psutil.Process()
+            # The first cpu_percent() call only sets the reference point.
+            self._process.cpu_percent(None)
+            psutil.cpu_percent(None)
+        except Exception:
+            self._psutil = None
+        if self.use_nvml:
+            try:
+                import pynvml
+                pynvml.nvmlInit()
+                self._gpu = pynvml.nvmlDeviceGetHandleByIndex(self.gpu_index)
+                self._nvml = pynvml
+            except Exception:
+                self._nvml = None
+
+    def _gpu_fields(self):
+        nvml, gpu = self._nvml, self._gpu
+        try:
+            util = nvml.nvmlDeviceGetUtilizationRates(gpu).gpu
+            mem_mb = round(nvml.nvmlDeviceGetMemoryInfo(gpu).used / 2**20, 1)
+            clock = nvml.nvmlDeviceGetClockInfo(gpu, nvml.NVML_CLOCK_SM)
+            temp = nvml.nvmlDeviceGetTemperature(gpu, nvml.NVML_TEMPERATURE_GPU)
+        except Exception:
+            return None, None, None, None
+        return util, mem_mb, clock, temp
+
+    def sample(self):
+        now = time.perf_counter()
+        frames = self.stats.frames if self.stats is not None else None
+        previous = self.samples[(self.count - 1) % self.capacity] if self.count else None
+        fps = None
+        if previous is not None and frames is not None and now > previous["time_s"]:
+            fps = round((frames - previous["frames"]) / (now - previous["time_s"]), 2)
+        cpu_process = cpu_system = None
+        if self._psutil is not None:
+            cpu_process = self._process.cpu_percent(None)
+            cpu_system = self._psutil.cpu_percent(None)
+        gpu = self._gpu_fields() if self._nvml is not None else (None, None, None, None)
+        values = (now, frames, fps, cpu_process, cpu_system) + gpu
+        self.samples[self.count % self.capacity] = dict(zip(self.FIELDS, values))
+        self.count += 1
+
+    def run(self):
+        self._open()
+        while not self._stop_event.wait(self.interval):
+            started = time.perf_counter()
+            self.sample()
+            cost = time.perf_counter() - started
+            self.sample_time += cost
+            if cost > self.interval * self.max_overhead:
+                self.interval *= 2
+
+    def stop(self):
+        self._stop_event.set()
+
+    def recent(self):
+        # Samples still in the ring, oldest first.
+        if self.count <= self.capacity:
+            return self.samples[:self.count]
+        start = self.count % self.capacity
+        return self.samples[start:] + self.samples[:start]
+
+    def to_dict(self):
+        samples = self.recent()
+        summary = {}
+        for field in self.FIELDS[2:]:
+            values = [s[field] for s in samples if s[field] is not None]
+            if values:
+                summary[field] = {"mean": round(sum(values) / len(values), 2), "max": max(values)}
+        started = self.stats.started if self.stats is not None else 0.0
+        return {
+            "interval_s": self.interval,
+            "count": self.count,
+            "overhead_ms_per_sample": round(self.sample_time / self.count * 1000, 3) if self.count else 0.0,
+            "summary": summary,
+            # Times relative to the session start, like the rest of the export.
+            "samples": [dict(s, time_s=round(s["time_s"] - started, 3)) for s in samples],
+        }
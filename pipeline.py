@@ -0,0 +1,257 @@
+import threading
+import time
+
+import numpy as np
+
+
+class FrameRing:
+    """Small set of reusable frame buffers with a latest-frame-wins handoff.
+
+    Built for one writer (the capture stage) and one reader (the inference stage).
+    Three slots let the writer always find a free buffer while the reader holds one
+    and another waits as the newest frame. Frames that are overwritten before the
+    reader picks them up are counted in `dropped`.
+    """
+
+    def __init__(self, shape, dtype=np.float32, slots=3, pixels_shape=None):
+        if slots < 3:
+            raise ValueError("FrameRing needs at least 3 slots")
+        self.buffers = [np.empty(shape, dtype=dtype) for _ in range(slots)]
+        # Optional model-resolution BGRA copy of each frame (for the recorder).
+        self.pixels = [np.empty(pixels_shape, dtype=np.uint8) for _ in range(slots)] if pixels_shape else None
+        self.timestamps = [0.0] * slots
+        # False when the change gate found the frame identical to the last evaluated one;
+        # such slots are not preprocessed and the reader should reuse its last prediction.
+        self.changed = [True] * slots
+        self.published = 0
+        self.dropped = 0
+        self._cond = threading.Condition()
+        self._latest = None
+        self._reading = None
+        self._closed = False
+
+    def acquire_write(self):
+        # Any slot that is neither waiting to be read nor currently being read.
+        with self._cond:
+            for index in range(len(self.buffers)):
+                if index != self._latest and index != self._reading:
+                    return index
+        raise RuntimeError("FrameRing has no free slot")
+
+    def publish(self, index, timestamp, changed=True):
+        with self._cond:
+            if self._latest is not None:
+                # The previous frame was never picked up and is now stale.
+                self.dropped += 1
+            self.timestamps[index] = timestamp
+            self.changed[index] = changed
+            self._latest = index
+            self.published += 1
+            self._cond.notify()
+
+    def latest_changed(self):
+        # True while a changed frame is waiting to be read. Publishing over it drops it, so
+        # the next frame must carry the change (be preprocessed and flagged) instead.
+        with self._cond:
+            return self._latest is not None and self.changed[self._latest]
+
+    def acquire_read(self, timeout=None):
+        # Waits for the newest frame and hands it to the reader; the slot read
+        # previously is released. Returns None on timeout or once the ring is closed.
+        with self._cond:
+            self._reading = None
+            self._cond.wait_for(lambda: self._latest is not None or self._closed, timeout)
+            if self._latest is None:
+                return None
+            self._reading, self._latest = self._latest, None
+            return self._reading
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class FrameChangeGate:
+    """Cheap check on the raw BGRA frame for whether it is worth running the model.
+
+    Keeps a thumbnail of the green channel (a strided sample, ~`thumb_size` wide, copied
+    into preallocated buffers) and counts the samples that moved by more than
+    `pixel_threshold` levels since the last evaluated frame. A changed-pixel count is
+    used instead of a mean difference because the skill-check needle is only a few
+    pixels wide and barely moves a frame-wide mean. At most `max_reuse` frames in a row
+    are skipped, so slow drift below the thresholds still gets evaluated. `force` marks a
+    frame as changed regardless (it becomes the new reference).
+    """
+
+    def __init__(self, pixel_threshold=16, min_pixels=4, max_reuse=30, thumb_size=112):
+        self.pixel_threshold = pixel_threshold
+        self.min_pixels = min_pixels
+        self.max_reuse = max_reuse
+        self.thumb_size = thumb_size
+        self.skipped = 0
+        self.evaluated = 0
+        self._shape = None
+        self._reused = 0
+
+    def _sample(self, frame):
+        height, width = frame.shape[:2]
+        step_y = max(height // self.thumb_size, 1)
+        step_x = max(width // self.thumb_size, 1)
+        return frame[::step_y, ::step_x, 1]
+
+    def changed(self, frame, force=False):
+        sample = self._sample(frame)
+        if sample.shape != self._shape:
+            self._shape = sample.shape
+            self._reference = np.empty(sample.shape, dtype=np.int16)
+            self._thumb = np.empty(sample.shape, dtype=np.int16)
+            self._mask = np.empty(sample.shape, dtype=bool)
+            np.copyto(self._reference, sample)
+            self._reused = 0
+            self.evaluated += 1
+            return True
+
+        np.copyto(self._thumb, sample)
+        np.subtract(self._thumb, self._reference, out=self._thumb)
+        np.abs(self._thumb, out=self._thumb)
+        np.greater(self._thumb, self.pixel_threshold, out=self._mask)
+        if not force and np.count_nonzero(self._mask) < self.min_pixels and self._reused < self.max_reuse:
+            self._reused += 1
+            self.skipped += 1
+            return False
+
+        # Evaluated frames become the new reference.
+        np.copyto(self._reference, sample)
+        self._reused = 0
+        self.evaluated += 1
+        return True
+
+
+class CaptureStage(threading.Thread):
+    """Grabs and preprocesses frames into a FrameRing, paced by a FrameScheduler.
+
+    Runs next to the inference loop: screen grabs and the ONNX Runtime call both release
+    the GIL, so the two stages overlap instead of adding up. Frames are grabbed through
+    the model's capture backend into one persistent raw buffer. When a PerfStats is given,
+    the capture, preprocess and pacing wait time of every frame is recorded in it.
+    With a FrameChangeGate, frames that did not change are published without being
+    preprocessed and flagged in `ring.changed`; a frame that replaces an unread changed
+    frame is always preprocessed, so the change the gate saw is never lost to a drop. If the ring keeps pixel buffers, the
+    resampled BGRA frame is copied alongside the tensor. With several capture regions,
+    every region is grabbed and preprocessed into its row of the batched ring slot
+    (the change gate is not used then).
+    """
+
+    def __init__(self, ai_model, ring, scheduler, stats=None, gate=None):
+        super().__init__(name="EuclidCapture", daemon=True)
+        self.ai_model = ai_model
+        self.ring = ring
+        self.scheduler = scheduler
+        self.stats = stats
+        self.gate = gate
+        self.running = True
+        self.error = None
+
+    def run(self):
+        stats = self.stats
+        gate = self.gate
+        regions = self.ai_model.batch_size > 1
+        if regions:
+            frames = self.ai_model.allocate_regions()
+        else:
+            frame = self.ai_model.capture.allocate()
+        try:
+            while self.running:
+                waited = self.scheduler.wait()
+                index = self.ring.acquire_write()
+                started = time.perf_counter()
+                if regions:
+                    _, captured_at = self.ai_model.grab_regions(frames)
+                else:
+                    _, captured_at = self.ai_model.grab(frame)
+                grabbed_at = time.perf_counter()
+                changed = regions or gate is None or gate.changed(frame, force=self.ring.latest_changed())
+                if regions:
+                    pixels = self.ring.pixels[index] if self.ring.pixels is not None else None
+                    self.ai_model.preprocess_regions(frames, out=self.ring.buffers[index], pixels=pixels)
+                elif self.ring.pixels is not None:
+                    pixels = self.ai_model.resample(frame)
+                    np.copyto(self.ring.pixels[index], pixels)
+                    if changed:
+                        self.ai_model.normalize(pixels, out=self.ring.buffers[index])
+                elif changed:
+                    self.ai_model.preprocess(frame, out=self.ring.buffers[index])
+                self.ring.publish(index, captured_at, changed)
+                if stats is not None:
+                    stats.record("sleep", waited)
+                    stats.record("capture", grabbed_at - started)
+                    stats.record("preprocess", time.perf_counter() - grabbed_at)
+        except Exception as e:
+            self.error = e
+        finally:
+            # Display handles belong to this thread; the next stage reopens them.
+            self.ai_model.close_capture()
+            self.scheduler.close()
+            self.ring.close()
+
+    def stop(self):
+        self.running = False
+
+
+class HitTrigger:
+    """Cooldown-gated key press shared by the monitor loop and offline tools."""
+
+    def __init__(self, press, release, key):
+        self.press = press
+        self.release = release
+        self.key = key
+        self.last_hit_time = None
+
+    def update(self, prediction, cooldown, now, captured_at=None, offset=0.0):
+        # Presses the key for a hit prediction unless still cooling down; returns True if pressed.
+        # captured_at/offset are only used by the latency-compensated trigger (dbd.hit_timing).
+        if not prediction.hit:
+            return False
+        if self.last_hit_time is not None and now - self.last_hit_time < cooldown:
+            return False
+        self.press(self.key)
+        self.release(self.key)
+        self.last_hit_time = now
+        return True
+
+    def close(self):
+        pass
+
+
+class RegionTriggers:
+    """One trigger per capture region, pressing the same key under a shared cooldown.
+
+    Each region keeps its own trigger (and, for PredictiveHitTrigger, its own probability
+    history), so the hit decision is made per region; a press from any region, including
+    a timed one, starts the cooldown for all of them.
+    """
+
+    def __init__(self, triggers):
+        self.triggers = triggers
+
+    def update(self, predictions, cooldown, now, captured_at=None, offset=0.0):
+        # Returns True if any region pressed.
+        pressed = False
+        for trigger, prediction in zip(self.triggers, predictions):
+            self._share_cooldown()
+            if trigger.update(prediction, cooldown, now, captured_at, offset):
+                pressed = True
+        return pressed
+
+    def _share_cooldown(self):
+        last = max((t.last_hit_time for t in self.triggers if t.last_hit_time is not None), default=None)
+        if last is None:
+            return
+        for trigger in self.triggers:
+            if trigger.last_hit_time is None or trigger.last_hit_time < last:
+                trigger.last_hit_time = last
+
+    def close(self):
+        for trigger in self.triggers:
+            trigger.close()
@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class FrameRecorder:
+    """Opt-in recorder of the frames and predictions the monitor loop actually saw.
+
+    Every frame (the 224x224 BGRA pixels fed to the model) is copied together with its
+    logits, class, timestamps and press flag into one record of a preallocated
+    memory-mapped ring file, so the hot loop only does a bounded memcpy. When a frame
+    is predicted as anything but "None" or a key is pressed, the window from `before`
+    frames earlier to `after` frames later is marked; a writer thread copies finished
+    windows out of the ring and saves them as compressed .npz chunks. Chunks hold
+    `frames` (N, 224, 224, 4) BGRA, which dbd.replay reads directly, plus `logits`,
+    `pred`, `captured_at`, `decided_at`, `pressed` and `gated`. Gated frames were not run
+    through the model (cascade or change gate); their `logits` repeat those of the last
+    evaluated frame (NaN before the first one).
+
+    Windows the writer could not copy before the ring wrapped around are counted in
+    `lost_windows` instead of blocking the caller.
+    """
+
+    def __init__(self, directory, num_classes, capacity=256, before=30, after=30, shape=(224, 224, 4)):
+        if capacity < 2 * (before + after + 1):
+            raise ValueError("Recorder ring must hold at least two full windows")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.capacity = capacity
+        self.before = before
+        self.after = after
+        self.dtype = np.dtype([
+            ("frame", np.uint8, shape),
+            ("logits", np.float32, (num_classes,)),
+            ("pred", np.int16),
+            ("captured_at", np.float64),
+            ("decided_at", np.float64),
+            ("pressed", np.bool_),
+            ("gated", np.bool_),
+        ])
+        self.ring_path = os.path.join(directory, "ring.dat")
+        self.ring = np.memmap(self.ring_path, dtype=self.dtype, mode="w+", shape=(capacity,))
+        # Per-field views, so a record is a handful of copies into existing memory.
+        self._frames = self.ring["frame"]
+        self._logits = self.ring["logits"]
+        self._pred = self.ring["pred"]
+        self._captured = self.ring["captured_at"]
+        self._decided = self.ring["decided_at"]
+        self._pressed = self.ring["pressed"]
+        self._gated = self.ring["gated"]
+        self._last_logits = np.full(num_classes, np.nan, dtype=np.float32)
+        self.session = time.strftime("%Y%m%d-%H%M%S")
+        self.head = 0  # sequence number of the next record
+        self.chunks = 0
+        self.lost_windows = 0
+        self.press_pending = False  # set from other threads (timed presses) and folded into the next record
+        self._window = None
+        self._submitted = 0  # end of the last submitted window; windows never overlap
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._running = True
+        self._writer = threading.Thread(target=self._write_loop, name="EuclidRecorder", daemon=True)
+        self._writer.start()
+
+    def record(self, pixels, prediction, captured_at, decided_at, pressed=False):
+        seq = self.head
+        slot = seq % self.capacity
+        np.copyto(self._frames[slot], pixels)
+        if not prediction.gated:
+            self._last_logits = prediction.logits
+        self._logits[slot] = self._last_logits
+        self._gated[slot] = prediction.gated
+        self._pred[slot] = prediction.pred
+        self._captured[slot] = captured_at
+        self._decided[slot] = decided_at
+        if self.press_pending:
+            pressed, self.press_pending = True, False
+        self._pressed[slot] = pressed
+        self.head = seq + 1
+
+        if prediction.pred != 0 or pressed:
+            if self._window is None:
+                self._window = [max(seq - self.before, self._submitted, seq + 1 - self.capacity // 2), seq + self.after]
+            else:
+                self._window[1] = max(self._window[1], seq + self.after)
+        window = self._window
+        if window is not None and (seq >= window[1] or seq + 1 - window[0] >= self.capacity // 2):
+            # Window complete (or as long as the writer can safely lag behind): hand it over.
+            self._window = None
+            self._submit(window[0], seq + 1)
+
+    def _submit(self, start, end):
+        self._submitted = end
+        with self._cond:
+            self._pending.append((start, end))
+            self._cond.notify()
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                while self._running and not self._pending:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                start, end = self._pending.popleft()
+            self._write(start, end)
+
+    def _write(self, start, end):
+        if self.head - start >= self.capacity:
+            self.lost_windows += 1
+            return
+        records = self.ring[np.arange(start, end) % self.capacity]  # fancy index: a copy
+        if self.head - start >= self.capacity:
+            # Overwritten while copying.
+            self.lost_windows += 1
+            return
+        path = os.path.join(self.directory, f"euclid_{self.session}_{start:08d}.npz")
+        np.savez_compressed(path, frames=records["frame"], logits=records["logits"], pred=records["pred"],
+                            captured_at=records["captured_at"], decided_at=records["decided_at"],
+                            pressed=records["pressed"], gated=records["gated"])
+        self.chunks += 1
+
+    def close(self):
+        # Flush the open window, wait for the writer and remove the ring file.
+        if self._window is not None:
+            self._submit(self._window[0], self.head)
+            self._window = None
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._writer.join()
+        # Drop every view of the mapping before deleting the file (required on Windows).
+        self._frames = self._logits = self._pred = self._captured = self._decided = self._pressed = self._gated = None
+        self.ring = None
+        try:
+            os.remove(self.ring_path)
+        except OSError:
+            pass
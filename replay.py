@@ -0,0 +1,131 @@
+"""Offline frame replay through the Euclid detection pipeline.
+
+Feeds recorded or synthetic frames through a FileCapture backend and the same
+preprocessing, AI_model.predict and HitTrigger decision used by MonitorWorker.run, with a
+key sink that only counts presses.
+Runs headless on the CPU execution provider:
+
+    python -m dbd.replay frames/ --model model.onnx --threads 2
+    python -m dbd.replay session.npz --json replay_report.json
+    python -m dbd.replay euclid_recordings/
+    python -m dbd.replay synthetic:600 --size 298
+
+Frame sources: a directory of PNGs or of dbd.recorder .npz chunks, an .npy/.npz stack
+shaped (N, H, W, C) with uint8 RGB (C=3) or BGRA as grabbed by mss (C=4), or
+`synthetic[:N]` noise frames.
+"""
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+from dbd.AI_model import AI_model
+from dbd.capture import FileCapture, load_frames
+from dbd.pipeline import HitTrigger
+
+STAGES = ("capture", "preprocess", "inference", "decision", "total")
+
+
+def percentiles_ms(samples):
+    values = np.asarray(samples) * 1000.0
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3)}
+
+
+def replay(ai_model, frames, cooldown=0.0, fps=60, repeat=1, warmup=10):
+    """Run frames through capture -> preprocess -> predict -> hit decision and return a report dict.
+
+    Cooldowns are evaluated on a simulated clock advancing 1/fps per frame, so decisions
+    match what the live loop would do at that frame rate regardless of replay speed.
+    """
+    presses = Counter()
+    trigger = HitTrigger(lambda key: presses.update(["press"]), lambda key: None, key=0)
+
+    for frame in frames[:warmup]:
+        ai_model.predict(ai_model.preprocess(frame))
+
+    source = FileCapture(frames)
+    source.setup(source.default_region())
+    frame = source.allocate()
+    timings = {stage: [] for stage in STAGES}
+    classes = Counter()
+    triggered = Counter()
+    frame_index = 0
+    started = time.perf_counter()
+    for _ in range(repeat * len(frames)):
+        t0 = time.perf_counter()
+        source.grab_into(frame)
+        t1 = time.perf_counter()
+        image = ai_model.preprocess(frame)
+        t2 = time.perf_counter()
+        prediction = ai_model.predict(image)
+        t3 = time.perf_counter()
+        pressed = trigger.update(prediction, cooldown, frame_index / fps)
+        t4 = time.perf_counter()
+
+        timings["capture"].append(t1 - t0)
+        timings["preprocess"].append(t2 - t1)
+        timings["inference"].append(t3 - t2)
+        timings["decision"].append(t4 - t3)
+        timings["total"].append(t4 - t0)
+        classes[prediction.desc] += 1
+        if pressed:
+            triggered[prediction.desc] += 1
+        frame_index += 1
+    wall = time.perf_counter() - started
+
+    return {
+        "frames": frame_index,
+        "wall_s": round(wall, 3),
+        "throughput_fps": round(frame_index / wall, 1) if wall > 0 else None,
+        "provider": ai_model.check_provider(),
+        "latency_ms": {stage: percentiles_ms(samples) for stage, samples in timings.items()},
+        "classes": dict(classes),
+        "presses": dict(triggered),
+        "total_presses": presses["press"],
+    }
+
+
+def print_report(report):
+    print(f"Frames: {report['frames']}  Wall: {report['wall_s']} s  "
+          f"Throughput: {report['throughput_fps']} FPS  Provider: {report['provider']}")
+    print(f"{'stage':<12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, p in report["latency_ms"].items():
+        print(f"{stage:<12}{p['p50']:>10.3f}{p['p95']:>10.3f}{p['p99']:>10.3f}")
+    print("Decisions:")
+    for desc in AI_model.DESCRIPTIONS:
+        if desc in report["classes"]:
+            print(f"  {desc:<30}{report['classes'][desc]:>8}  pressed {report['presses'].get(desc, 0)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay frames through the Euclid detection pipeline.")
+    parser.add_argument("source", help="PNG directory, .npy/.npz stack, or synthetic[:N]")
+    parser.add_argument("--model", default="model.onnx")
+    parser.add_argument("--threads", type=int, default=2, help="CPU threads for ONNX Runtime")
+    parser.add_argument("--size", type=int, default=224, help="Capture size for synthetic frames")
+    parser.add_argument("--fps", type=float, default=60, help="Simulated capture rate for cooldowns")
+    parser.add_argument("--cooldown", type=float, default=0.0, help="Hit cooldown in seconds")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--json", help="Also write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    frames = load_frames(args.source, size=args.size)
+    if not frames:
+        print(f"No frames found in {args.source}")
+        return 1
+    ai_model = AI_model(args.model, use_gpu=False, nb_cpu_threads=args.threads, capture=FileCapture(frames))
+    report = replay(ai_model, frames, args.cooldown, args.fps, args.repeat, args.warmup)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import sys
+import threading
+import time
+
+# How long before a deadline the coarse sleep hands over to spinning. Windows timers
+# wake up to a millisecond or more late even at 1 ms timer resolution.
+SPIN_MARGIN = 0.002 if sys.platform == "win32" else 0.0005
+
+
+def set_timer_resolution(enable):
+    # Ask Windows for 1 ms timer resolution while frames are being scheduled.
+    if sys.platform != "win32":
+        return
+    try:
+        import ctypes
+        winmm = ctypes.windll.winmm
+        if enable:
+            winmm.timeBeginPeriod(1)
+        else:
+            winmm.timeEndPeriod(1)
+    except Exception:
+        pass
+
+
+def spin_until(deadline):
+    # Busy-wait the last stretch before a deadline; sleep(0) yields the GIL on every pass.
+    while time.perf_counter() < deadline:
+        time.sleep(0)
+
+
+def precise_sleep_until(deadline, spin_margin=SPIN_MARGIN):
+    # Hybrid wait: coarse sleep until shortly before the deadline, then spin.
+    remaining = deadline - time.perf_counter() - spin_margin
+    if remaining > 0:
+        time.sleep(remaining)
+    spin_until(deadline)
+
+
+class FrameScheduler:
+    """Absolute-deadline frame pacing with an activity-adaptive rate.
+
+    Runs at `active_fps` while predictions show anything but class 0 ("None") and drops
+    to `idle_fps` once predictions have stayed at "None" for `idle_after` seconds. The
+    first non-None prediction switches straight back, waking a capture thread that is
+    mid-way through an idle sleep. Deadlines advance by whole periods, so oversleep does
+    not accumulate; a loop that falls more than one period behind resyncs to now.
+    """
+
+    def __init__(self, active_fps, idle_fps=None, idle_after=2.0, spin_margin=SPIN_MARGIN):
+        self.active_period = 1.0 / active_fps
+        self.idle_period = 1.0 / idle_fps if idle_fps else self.active_period
+        self.idle_after = idle_after
+        self.spin_margin = spin_margin
+        self.period = self.active_period
+        self.next_deadline = None
+        self.last_activity = time.perf_counter()
+        self.resyncs = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        set_timer_resolution(True)
+
+    @property
+    def idle(self):
+        return self.period != self.active_period
+
+    def wait(self):
+        # Blocks until the next frame slot and returns the time spent waiting.
+        start = time.perf_counter()
+        with self._lock:
+            if self.next_deadline is None or start - self.next_deadline > self.period:
+                if self.next_deadline is not None:
+                    self.resyncs += 1
+                self.next_deadline = start
+        while True:
+            remaining = self.next_deadline - time.perf_counter() - self.spin_margin
+            if remaining <= 0 or not self._wake.wait(remaining):
+                break
+            # observe() pulled the deadline in; re-evaluate against the new one.
+            self._wake.clear()
+        spin_until(self.next_deadline)
+        with self._lock:
+            self.next_deadline += self.period
+        return time.perf_counter() - start
+
+    def observe(self, active, now):
+        # Called by the inference stage for every prediction (active = not "None").
+        if active:
+            self.last_activity = now
+            if self.idle:
+                with self._lock:
+                    self.period = self.active_period
+                    if self.next_deadline is not None:
+                        self.next_deadline = min(self.next_deadline, now + self.active_period)
+                self._wake.set()
+        elif not self.idle and now - self.last_activity >= self.idle_after:
+            self.period = self.idle_period
+
+    def close(self):
+        set_timer_resolution(False)
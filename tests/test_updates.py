@@ -0,0 +1,165 @@
+"""dbd.updates against a local stand-in for the release server.
+
+The server honours Range and If-Range (strong ETag), can cut the connection after a given
+number of bytes and can publish a new release under the same URL, which covers resuming,
+verification and a partial download that outlives its release.
+
+    python -m unittest discover -s dbd/tests    # from the directory containing dbd
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dbd.updates import CHUNK_SIZE, UpdateError, download
+
+SIZE = 300_000
+CUT = 2 * CHUNK_SIZE  # where a dropped connection leaves the .part file
+
+
+def release(seed):
+    return bytes((i * 7 + seed) % 251 for i in range(SIZE))
+
+
+class ReleaseServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), ReleaseHandler)
+        self.publish(release(1), '"r1"')
+        self.cut_after = None  # bytes to send before dropping the connection, once
+        self.validators = True
+        self.requests = []  # (Range, If-Range, status) per request
+
+    def publish(self, content, etag):
+        self.content = content
+        self.etag = etag
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/Euclid.exe"
+
+
+class ReleaseHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        content = server.content
+        offset = 0
+        byte_range = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if byte_range and (if_range is None or if_range == server.etag):
+            offset = int(byte_range.split("=")[1].split("-")[0])
+        if offset >= len(content) and byte_range and offset:
+            server.requests.append((byte_range, if_range, 416))
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{len(content)}")
+            self.end_headers()
+            return
+        status = 206 if offset else 200
+        server.requests.append((byte_range, if_range, status))
+        body = content[offset:]
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        if offset:
+            self.send_header("Content-Range", f"bytes {offset}-{len(content) - 1}/{len(content)}")
+        if server.validators:
+            self.send_header("ETag", server.etag)
+        self.end_headers()
+        if server.cut_after is not None:
+            body, server.cut_after = body[:server.cut_after], None
+            self.wfile.write(body)
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+class DownloadTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ReleaseServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.directory = tempfile.mkdtemp()
+        self.dest = os.path.join(self.directory, "Euclid_update.exe")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def read_dest(self):
+        with open(self.dest, "rb") as f:
+            return f.read()
+
+    def interrupted_download(self, sha256):
+        # A run that stops mid-transfer and leaves <dest>.part behind.
+        self.server.cut_after = CUT
+        with self.assertRaises(Exception):
+            download(self.server.url, self.dest, sha256=sha256, retries=0)
+        self.assertEqual(os.path.getsize(self.dest + ".part"), CUT)
+
+    def test_resumes_after_dropped_connection(self):
+        content = self.server.content
+        self.server.cut_after = CUT
+        download(self.server.url, self.dest, sha256=hashlib.sha256(content).hexdigest())
+        self.assertEqual(self.read_dest(), content)
+        self.assertEqual(self.server.requests[-1], (f"bytes={CUT}-", '"r1"', 206))
+        self.assertFalse(os.path.exists(self.dest + ".part.meta"))
+
+    def test_resumes_interrupted_run(self):
+        content = self.server.content
+        self.interrupted_download(hashlib.sha256(content).hexdigest())
+        download(self.server.url, self.dest, sha256=hashlib.sha256(content).hexdigest())
+        self.assertEqual(self.read_dest(), content)
+        self.assertEqual(self.server.requests[-1][2], 206)
+
+    def test_restarts_when_release_changed(self):
+        self.interrupted_download(hashlib.sha256(self.server.content).hexdigest())
+        new = release(2)
+        self.server.publish(new, '"r2"')
+        download(self.server.url, self.dest, sha256=hashlib.sha256(new).hexdigest())
+        self.assertEqual(self.read_dest(), new)
+        self.assertEqual(self.server.requests[-1], (f"bytes={CUT}-", '"r1"', 200))
+
+    def test_no_checksum_never_resumes(self):
+        self.interrupted_download(None)
+        new = release(2)
+        self.server.publish(new, '"r2"')
+        download(self.server.url, self.dest)
+        self.assertEqual(self.read_dest(), new)
+        self.assertEqual(self.server.requests[-1], (None, None, 200))
+
+    def test_no_validator_never_resumes(self):
+        self.server.validators = False
+        content = self.server.content
+        self.interrupted_download(hashlib.sha256(content).hexdigest())
+        self.assertFalse(os.path.exists(self.dest + ".part.meta"))
+        download(self.server.url, self.dest, sha256=hashlib.sha256(content).hexdigest())
+        self.assertEqual(self.read_dest(), content)
+        self.assertEqual(self.server.requests[-1], (None, None, 200))
+
+    def test_checksum_mismatch(self):
+        with self.assertRaises(UpdateError):
+            download(self.server.url, self.dest, sha256="0" * 64)
+        self.assertFalse(os.path.exists(self.dest))
+        self.assertFalse(os.path.exists(self.dest + ".part"))
+
+    def test_complete_partial_file(self):
+        # A .part that already holds the whole file: the server answers 416 and it is verified as is.
+        content = self.server.content
+        sha256 = hashlib.sha256(content).hexdigest()
+        self.interrupted_download(sha256)
+        with open(self.dest + ".part", "ab") as f:
+            f.write(content[CUT:])
+        download(self.server.url, self.dest, sha256=sha256)
+        self.assertEqual(self.read_dest(), content)
+        self.assertEqual(self.server.requests[-1][2], 416)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+"""Update check and download, kept free of Qt so it can run on any thread and be tested
+against a local HTTP server.
+
+Downloads stream to `<dest>.part` in chunks and resume from it with a Range request after
+a dropped connection or an interrupted run. The server's validator (ETag or Last-Modified)
+is kept in `<dest>.part.meta` and sent back as If-Range, so a partial file of an older
+release is never completed with bytes of a newer one: the server then answers with the
+whole new file. Without a validator or a published checksum a partial file is discarded
+instead of resumed. The finished file is checked against the expected size and SHA-256
+before it is renamed into place.
+"""
+import hashlib
+import json
+import os
+
+import requests
+
+CHUNK_SIZE = 1 << 16
+TIMEOUT = (5, 30)  # (connect, read) seconds
+
+
+class UpdateError(Exception):
+    pass
+
+
+def fetch_remote_version(url, timeout=TIMEOUT):
+    response = requests.get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.text.strip()
+
+
+def fetch_checksum(url, timeout=TIMEOUT):
+    # Hex SHA-256 from a "<digest>  <filename>" (sha256sum style) file, or None if none is published.
+    try:
+        response = requests.get(url, timeout=timeout)
+    except requests.RequestException:
+        return None
+    if response.status_code != 200:
+        return None
+    fields = response.text.split()
+    return fields[0].lower() if fields else None
+
+
+def _hash_file(path, digest):
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+
+def _total_size(response, offset):
+    # Full file size from Content-Range ("bytes 100-999/1000") or Content-Length.
+    content_range = response.headers.get("Content-Range", "")
+    if "/" in content_range and not content_range.endswith("/*"):
+        return int(content_range.rsplit("/", 1)[1])
+    length = response.headers.get("Content-Length")
+    return offset + int(length) if length is not None else None
+
+
+def _validator(response):
+    # Strong ETag or Last-Modified, usable in If-Range; weak ETags (W/"...") are not.
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("Last-Modified")
+
+
+def _load_validator(url, meta):
+    try:
+        with open(meta) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data.get("validator") if data.get("url") == url else None
+
+
+def _discard(*paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _fetch(url, part, progress, timeout, resume=True):
+    # Append the rest of the file to `part`; returns the total size reported by the server.
+    meta = part + ".meta"
+    validator = _load_validator(url, meta) if resume else None
+    if validator is None:
+        # Unknown origin (or resuming not allowed): never append to it.
+        _discard(part, meta)
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    headers = {"Range": f"bytes={offset}-", "If-Range": validator} if offset else {}
+    with requests.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 416:
+            # Nothing left to fetch (or a stale partial file that is too long).
+            content_range = response.headers.get("Content-Range", "")
+            if content_range.endswith(f"/{offset}"):
+                return offset
+            _discard(part, meta)
+            raise UpdateError("Partial download does not match the remote file")
+        response.raise_for_status()
+        if response.status_code != 206:
+            # Range ignored, or the file changed since the partial download (If-Range
+            # mismatch): the body is the whole current file, so start over.
+            offset = 0
+            _discard(meta)
+            validator = _validator(response) if resume else None
+            if validator is not None:
+                with open(meta, "w") as f:
+                    json.dump({"url": url, "validator": validator}, f)
+        total = _total_size(response, offset)
+        done = offset
+        with open(part, "ab" if offset else "wb") as f:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                f.write(chunk)
+                done += len(chunk)
+                if progress is not None:
+                    progress(done, total)
+    return total
+
+
+def download(url, dest, sha256=None, size=None, progress=None, retries=3, timeout=TIMEOUT):
+    """Download `url` to `dest`, resuming a previous partial download, and verify it.
+
+    `progress(done, total)` is called after every chunk (total may be None). Connection
+    errors and timeouts are retried up to `retries` times from where the transfer stopped.
+    Only downloads verified by `sha256` are resumed; without one (size check only) every
+    attempt starts from zero. Raises UpdateError if the size or checksum does not match;
+    the partial file is then removed so the next attempt starts clean.
+    """
+    part = dest + ".part"
+    meta = part + ".meta"
+    for attempt in range(retries + 1):
+        try:
+            total = _fetch(url, part, progress, timeout, resume=bool(sha256))
+            break
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+            if attempt == retries:
+                raise
+
+    expected_size = size if size is not None else total
+    actual_size = os.path.getsize(part)
+    if expected_size is not None and actual_size != expected_size:
+        _discard(part, meta)
+        raise UpdateError(f"Size mismatch: expected {expected_size} bytes, got {actual_size}")
+    if sha256:
+        digest = hashlib.sha256()
+        _hash_file(part, digest)
+        if digest.hexdigest() != sha256.lower():
+            _discard(part, meta)
+            raise UpdateError("Checksum mismatch")
+    os.replace(part, dest)
+    _discard(meta)
+    return dest